@@ -0,0 +1,135 @@
+import hashlib
+import mmap
+import os
+import struct
+
+import pygame
+
+# Baked images live here, one raw pixel file per (source file, size, display format)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.asset_cache')
+
+# magic, version, width, height, has alpha
+HEADER = struct.Struct('<4sHHHH')
+MAGIC = b'ACSH'
+VERSION = 1
+
+# Keeps the memory maps alive for as long as surfaces built on them are in use
+_mapped = {}
+
+
+def display_format():
+    # Byte order of the display surface, so baked pixels can be used without conversion
+    masks = pygame.display.get_surface().get_masks()
+    if masks[:3] == (0xff0000, 0xff00, 0xff):
+        return 'BGRA'
+    return 'RGBA'
+
+
+def cache_path(path, size, alpha):
+    with open(path, 'rb') as f:
+        file_hash = hashlib.sha1(f.read()).hexdigest()
+    surface = pygame.display.get_surface()
+    key = f'{file_hash}-{size[0]}x{size[1]}-{int(alpha)}-{display_format()}-{surface.get_bitsize()}-{surface.get_masks()}'
+    return os.path.join(CACHE_DIR, f'{cache_stem(path, size)}-{hashlib.sha1(key.encode()).hexdigest()[:16]}.raw')
+
+
+def cache_stem(path, size):
+    return f'{os.path.splitext(os.path.basename(path))[0]}-{size[0]}x{size[1]}'
+
+
+
+def scaled_size(path, scale):
+    # Reads the PNG header so the size is known without decoding the image
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if header[:8] == b'\x89PNG\r\n\x1a\n':
+        width, height = struct.unpack('>II', header[16:24])
+    else:
+        width, height = pygame.image.load(path).get_size()
+    return int(width * scale), int(height * scale)
+
+
+def decode(path, size, alpha):
+    # The slow path: PNG decode, convert to the display format and scale
+    image = pygame.image.load(path)
+    image = image.convert_alpha() if alpha else image.convert()
+    if image.get_size() != size:
+        image = pygame.transform.scale(image, size)
+    return image
+
+
+def bake(path, scale=1.0, alpha=True):
+    size = scaled_size(path, scale)
+    image = decode(path, size, alpha)
+    write_baked(path, cache_path(path, size, alpha), image, alpha)
+    return image
+
+
+def write_baked(path, target, image, alpha):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # Drop older bakes of the same file and size so stale entries don't pile up
+    stem = cache_stem(path, image.get_size())
+    for name in os.listdir(CACHE_DIR):
+        if name.rsplit('-', 1)[0] == stem and os.path.join(CACHE_DIR, name) != target:
+            os.remove(os.path.join(CACHE_DIR, name))
+
+    write_atomic(target, [HEADER.pack(MAGIC, VERSION, image.get_width(), image.get_height(), int(alpha)),
+                          pygame.image.tobytes(image, display_format())])
+
+
+def write_atomic(path, chunks):
+    # Writes to a temp file, syncs it to disk and renames it over path, so neither a running
+    # game nor a power cut mid-write leaves a half-written or empty file at path
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_baked(target):
+    # The baked image, or None if the entry is unreadable, truncated or from another version
+    try:
+        with open(target, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    except (OSError, ValueError):
+        return None  # Empty files can't be mapped
+    try:
+        magic, version, width, height, alpha = HEADER.unpack_from(mapped)
+    except struct.error:
+        mapped.close()
+        return None
+    if magic != MAGIC or version != VERSION or len(mapped) != HEADER.size + width * height * 4:
+        mapped.close()
+        return None
+    image = pygame.image.frombuffer(memoryview(mapped)[HEADER.size:], (width, height), display_format())
+    if not alpha:
+        # Opaque images are copied into a surface without per-pixel alpha, which blits faster
+        image = image.convert()
+        mapped.close()
+    elif image.get_masks() != pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha().get_masks():
+        image = image.convert_alpha()
+        mapped.close()
+    else:
+        _mapped[target] = mapped
+    return image
+
+
+def load_image(path, scale=1.0, alpha=True):
+    # Needs pygame.display.set_mode() to have been called, since the cache is keyed by display format
+    size = scaled_size(path, scale)
+    target = cache_path(path, size, alpha)
+    if os.path.exists(target):
+        image = load_baked(target)
+        if image is not None:
+            return image
+    # Stale or missing cache entry: decode the PNG and bake it for next time
+    image = decode(path, size, alpha)
+    try:
+        write_baked(path, target, image, alpha)
+    except OSError:
+        pass  # A read-only install still runs, just without the cache
+    return image
@@ -0,0 +1,451 @@
+import os
+
+# Both games run without a window or sound card
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import struct
+import sys
+import time
+import tracemalloc
+import types
+from collections import deque
+
+import pygame
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+REPLAY_DIR = os.path.join(ROOT, 'replays')
+FRAME_DT = 1 / 60  # Every benchmark frame advances the games by exactly one 60 Hz frame
+
+# Replay log: a header, the recorded session's outcome as JSON, then one fixed-size record per
+# input event. Bump REPLAY_MAGIC when the layout changes; older logs are re-recorded.
+REPLAY_MAGIC = b'RPL2'
+REPLAY_HEADER = struct.Struct('<4sIIH')  # magic, seed, frame count, outcome length
+REPLAY_RECORD = struct.Struct('<IBIhh')  # frame, kind, button or key code, x, y
+EVENT_KINDS = [pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION, pygame.KEYDOWN, pygame.KEYUP]
+
+
+class Replay:
+    def __init__(self, seed, frames=0, records=None, outcome=None):
+        self.seed = seed
+        self.frames = frames
+        self.records = records or []
+        self.outcome = outcome  # What the recorded session did, see Outcome
+        self.by_frame = None
+
+    def add(self, frame, event):
+        kind = EVENT_KINDS.index(event.type)
+        code = getattr(event, 'key', getattr(event, 'button', 0))
+        x, y = getattr(event, 'pos', (0, 0))
+        self.records.append((frame, kind, code, x, y))
+
+    def events(self, frame):
+        if self.by_frame is None:
+            self.by_frame = {}
+            for record in self.records:
+                self.by_frame.setdefault(record[0], []).append(record)
+        return [to_event(record) for record in self.by_frame.get(frame, [])]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        outcome = json.dumps(self.outcome).encode()
+        with open(path, 'wb') as f:
+            f.write(REPLAY_HEADER.pack(REPLAY_MAGIC, self.seed, self.frames, len(outcome)))
+            f.write(outcome)
+            for record in self.records:
+                f.write(REPLAY_RECORD.pack(*record))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:len(REPLAY_MAGIC)] != REPLAY_MAGIC:
+            raise ValueError(f'{path} is not a {REPLAY_MAGIC.decode()} replay log')
+        magic, seed, frames, outcome_length = REPLAY_HEADER.unpack_from(data)
+        start = REPLAY_HEADER.size + outcome_length
+        outcome = json.loads(data[REPLAY_HEADER.size:start])
+        records = list(REPLAY_RECORD.iter_unpack(data[start:]))
+        return cls(seed, frames, records, outcome)
+
+
+def to_event(record):
+    _, kind, code, x, y = record
+    event_type = EVENT_KINDS[kind]
+    if event_type in (pygame.KEYDOWN, pygame.KEYUP):
+        return pygame.event.Event(event_type, key=code, mod=0)
+    if event_type == pygame.MOUSEMOTION:
+        return pygame.event.Event(event_type, pos=(x, y), rel=(0, 0), buttons=(1, 0, 0))
+    return pygame.event.Event(event_type, pos=(x, y), button=code)
+
+
+class Outcome:
+    # What a session did: the game states it went through, in order, and how many shells or
+    # levels it finished. It's saved with the replay and checked on every run, so a replay that
+    # no longer drives the game (say the rules changed under it) fails instead of timing nothing.
+    def __init__(self):
+        self.states = []
+        self.completions = 0
+
+    def track(self, state, completions):
+        # Call after every frame
+        if not self.states or self.states[-1] != state:
+            self.states.append(state)
+        self.completions = completions
+
+    def to_json(self):
+        return {'states': self.states, 'completions': self.completions}
+
+
+class Recorder:
+    # Posts scripted input for the current frame and logs it to a Replay
+    def __init__(self, replay):
+        self.replay = replay
+        self.frame = 0
+        self.queued = []
+
+    def post(self, event_type, **attributes):
+        event = pygame.event.Event(event_type, **attributes)
+        self.replay.add(self.frame, event)
+        self.queued.append(event)
+
+    def take(self):
+        queued, self.queued = self.queued, []
+        return queued
+
+
+# Computer Builder (pythonmain.py)
+
+def builder_session(seed):
+    os.chdir(ROOT)
+    random.seed(seed)
+    import pythonmain
+    with contextlib.redirect_stdout(io.StringIO()):
+        return pythonmain.Game()
+
+
+def builder_frame(game, events):
+    for event in events:
+        pygame.event.post(event)
+    with contextlib.redirect_stdout(io.StringIO()):
+        game.input.pump()
+        alpha = game.loop.advance(FRAME_DT, game.update)
+        pygame.display.update(game.draw(alpha))
+
+
+def builder_script(game, recorder, state):
+    # Clicks Start, then drags every part from the tray into its slot, shell after shell
+    if game.game_state == "START":
+        if not state.get('clicked'):
+            pos = game.start_button.rect.center
+            recorder.post(pygame.MOUSEBUTTONDOWN, pos=pos, button=1)
+            recorder.post(pygame.MOUSEBUTTONUP, pos=pos, button=1)
+            state['clicked'] = True
+        return
+    if game.game_state != "PLAYING":
+        return
+
+    path = state.get('path')
+    if path:
+        # A burst of motion events per frame, like a high polling rate mouse
+        for _ in range(8):
+            if len(path) > 1:
+                pos = path.popleft()
+                recorder.post(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(1, 0, 0))
+        if len(path) == 1:
+            recorder.post(pygame.MOUSEBUTTONUP, pos=path.popleft(), button=1)
+        return
+
+    for part in game.tray.parts:
+        if part.name in game.pc_slots and part.name not in game.assembled_parts:
+            start = part.rect.center
+            end = game.pc_slots[part.name].move(game.pc_shell_rect.topleft).center
+            steps = 40
+            state['path'] = deque((start[0] + (end[0] - start[0]) * i // steps,
+                                   start[1] + (end[1] - start[1]) * i // steps) for i in range(1, steps + 1))
+            recorder.post(pygame.MOUSEBUTTONDOWN, pos=start, button=1)
+            return
+
+
+def builder_completions(game):
+    # Shells finished
+    return game.current_shell + int(game.check_all_parts_assembled())
+
+
+def record_builder(seed, frames):
+    game = builder_session(seed)
+    replay = Replay(seed, frames)
+    recorder = Recorder(replay)
+    outcome = Outcome()
+    state = {}
+    for frame in range(frames):
+        recorder.frame = frame
+        builder_script(game, recorder, state)
+        builder_frame(game, recorder.take())
+        outcome.track(game.game_state, builder_completions(game))
+    game.shells.close()
+    replay.outcome = outcome.to_json()
+    return replay
+
+
+def run_builder(replay):
+    # Returns (frame times, outcome)
+    game = builder_session(replay.seed)
+    outcome = Outcome()
+    times = []
+    for frame in range(replay.frames):
+        events = replay.events(frame)
+        start = time.perf_counter()
+        builder_frame(game, events)
+        times.append(time.perf_counter() - start)
+        outcome.track(game.game_state, builder_completions(game))
+    game.shells.close()
+    return times, outcome.to_json()
+
+
+# Cloud Resource Manager (pygame2nd.py, a Pygame Zero program)
+
+def maze_session(seed):
+    import pgzero.loaders
+    import pgzero.runner
+    from pgzero.game import PGZeroGame
+
+    import levels
+
+    pygame.event.set_allowed(None)
+    path = os.path.join(ROOT, 'pygame2nd.py')
+    mod = types.ModuleType('pygame2nd')
+    mod.__file__ = path
+    sys.modules['pygame2nd'] = mod
+    sys._pgzrun = True  # Makes pgzrun.go() return instead of entering pgzero's own loop
+    pgzero.runner.prepare_mod(mod)
+    # The sprites are checked in next to the script rather than in an images/ directory
+    pgzero.loaders.images.subpath = ''
+    random.seed(seed)
+    with open(path) as f:
+        code = compile(f.read(), path, 'exec')
+    # The scenario is the built-in maze, whatever level file `python levels.py` has left behind
+    open_levels, levels.open_levels = levels.open_levels, lambda path=None: None
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            exec(code, mod.__dict__)
+    finally:
+        levels.open_levels = open_levels
+    mod.IDLE_TIMEOUT_MS = 0  # Benchmarks measure frame cost, not idle sleeps
+    game = PGZeroGame(mod)
+    # pgzero's keyboard is one object for the whole process; keys a previous session left
+    # held would otherwise steer this one
+    game.keyboard._pressed.clear()
+    game.reinit_screen()
+    game.load_handlers()
+    return mod, game
+
+
+def maze_frame(mod, game, events):
+    # The body of PGZeroGame.mainloop, minus its clock
+    for event in events:
+        if event.type == pygame.KEYDOWN:
+            game.keyboard._press(event.key)
+        elif event.type == pygame.KEYUP:
+            game.keyboard._release(event.key)
+        game.dispatch_event(event)
+    with contextlib.redirect_stdout(io.StringIO()):
+        mod.update(FRAME_DT)
+        mod.draw()
+    pygame.display.flip()
+
+
+def maze_path(maze, start, goal):
+    # Breadth-first search over open cells, returning the cells after start
+    came_from = {start: None}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        if cell == goal:
+            break
+        x, y = cell
+        for nxt in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= nxt[1] < len(maze) and 0 <= nxt[0] < len(maze[0]) and maze[nxt[1]][nxt[0]] == 1 and nxt not in came_from:
+                came_from[nxt] = cell
+                queue.append(nxt)
+    if goal not in came_from:
+        return []
+    path = []
+    while goal != start:
+        path.append(goal)
+        goal = came_from[goal]
+    return path[::-1]
+
+
+def maze_script(mod, recorder, state):
+    # Clicks Start, skips the story screens, then walks the cloud to every resource and VM in turn
+    space = dict(key=pygame.K_SPACE, mod=0)
+    if mod.game_state == 'start':
+        recorder.post(pygame.MOUSEBUTTONDOWN, pos=(mod.WIDTH // 2, mod.button_y + 10), button=1)
+    elif mod.game_state in ('prologue', 'instructions', 'completed', 'credits'):
+        recorder.post(pygame.KEYDOWN, **space)
+        recorder.post(pygame.KEYUP, **space)
+    elif mod.game_state == 'playing':
+        grid = mod.grid
+        cell = grid.cell_at(mod.cloud.pos)
+        if not state.get('path'):
+            targets = [entity.pos for entity in mod.resource_nodes + mod.vms]
+            target = targets[state.get('target', 0) % len(targets)]
+            state['target'] = state.get('target', 0) + 1
+            state['path'] = maze_path(grid.cells, cell, grid.cell_at(target))
+            return
+        if abs(state['path'][0][0] - cell[0]) + abs(state['path'][0][1] - cell[1]) > 1:
+            # The game moved the cloud (e.g. a reset), so plan again from where it is now
+            state['path'] = None
+            return
+        # Head for the center of the next cell; the hitbox only fits round corners from there
+        aim = grid.cell_center(state['path'][0])
+        dx, dy = aim[0] - mod.cloud.x, aim[1] - mod.cloud.y
+        if abs(dx) >= 3:
+            key = pygame.K_RIGHT if dx > 0 else pygame.K_LEFT
+        elif abs(dy) >= 3:
+            key = pygame.K_DOWN if dy > 0 else pygame.K_UP
+        else:
+            state['path'].pop(0)
+            return
+        if state.get('key') != key:
+            if state.get('key'):
+                recorder.post(pygame.KEYUP, key=state['key'], mod=0)
+            recorder.post(pygame.KEYDOWN, key=key, mod=0)
+            state['key'] = key
+
+
+def maze_completions(mod, outcome):
+    # Levels finished
+    return outcome.completions + int(mod.game_state == 'completed' and outcome.states[-1:] != ['completed'])
+
+
+def record_maze(seed, frames):
+    mod, game = maze_session(seed)
+    replay = Replay(seed, frames)
+    recorder = Recorder(replay)
+    outcome = Outcome()
+    state = {}
+    for frame in range(frames):
+        recorder.frame = frame
+        maze_script(mod, recorder, state)
+        maze_frame(mod, game, recorder.take())
+        outcome.track(mod.game_state, maze_completions(mod, outcome))
+    replay.outcome = outcome.to_json()
+    return replay
+
+
+def run_maze(replay):
+    # Returns (frame times, outcome)
+    mod, game = maze_session(replay.seed)
+    outcome = Outcome()
+    times = []
+    for frame in range(replay.frames):
+        events = replay.events(frame)
+        start = time.perf_counter()
+        maze_frame(mod, game, events)
+        times.append(time.perf_counter() - start)
+        outcome.track(mod.game_state, maze_completions(mod, outcome))
+    return times, outcome.to_json()
+
+
+SCENARIOS = {
+    'builder': (record_builder, run_builder),
+    'maze': (record_maze, run_maze),
+}
+
+
+def percentile(sorted_times, q):
+    return sorted_times[min(len(sorted_times) - 1, int(q * len(sorted_times)))]
+
+
+def summarize(times):
+    ordered = sorted(times)
+    return {
+        'frames': len(times),
+        'mean_ms': sum(times) / len(times) * 1000,
+        'p50_ms': percentile(ordered, 0.5) * 1000,
+        'p95_ms': percentile(ordered, 0.95) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def measure_allocations(run, replay):
+    # A separate pass, since tracing allocations slows every frame down
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    run(replay)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocated = [stat for stat in after.compare_to(before, 'filename') if stat.size_diff > 0]
+    return {
+        'alloc_peak_kb': peak / 1024,
+        'alloc_net_kb': sum(stat.size_diff for stat in allocated) / 1024,
+        'alloc_net_blocks': sum(stat.count_diff for stat in allocated),
+    }
+
+
+def load_replay(name, seed, frames, rerecord):
+    path = os.path.join(REPLAY_DIR, f'{name}.rpl')
+    if not rerecord and os.path.exists(path):
+        try:
+            return Replay.load(path)
+        except ValueError as e:
+            print(f'{e}; recording it again')
+    replay = SCENARIOS[name][0](seed, frames)
+    replay.save(path)
+    return replay
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless frame-time benchmarks driven by recorded input replays.')
+    parser.add_argument('scenarios', nargs='*', default=list(SCENARIOS), help='scenarios to run (default: all)')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--frames', type=int, default=900)
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per scenario; the fastest p50 is kept')
+    parser.add_argument('--record', action='store_true', help='re-record the replay logs before running')
+    parser.add_argument('--replay', help='run this replay log instead of the scenario\'s default one')
+    parser.add_argument('--no-alloc', action='store_true', help='skip the allocation pass')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    pygame.init()
+    results = {}
+    desynced = []
+    for name in args.scenarios:
+        if args.replay:
+            replay = Replay.load(args.replay)
+        else:
+            replay = load_replay(name, args.seed, args.frames, args.record)
+        run = SCENARIOS[name][1]
+        runs = [run(replay) for _ in range(args.repeat)]
+        outcome = runs[0][1]
+        result = min((summarize(times) for times, _ in runs), key=lambda r: r['p50_ms'])
+        result.update(states=len(outcome['states']), completions=outcome['completions'])
+        if not args.no_alloc:
+            result.update(measure_allocations(run, replay))
+        result['in_sync'] = all(run_outcome == replay.outcome for _, run_outcome in runs)
+        results[name] = result
+        print(f"{name:8} " + '  '.join(f'{key} {value:.2f}' if isinstance(value, float) else f'{key} {value}'
+                                      for key, value in result.items()))
+        if not result['in_sync']:
+            desynced.append(name)
+            print(f"{name:8} replay desynced: recorded {replay.outcome}, played back {outcome}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    pygame.quit()
+    if desynced:
+        # The timings above aren't of the scripted session; re-record once the change is intended
+        sys.exit(f"Replays no longer drive {', '.join(desynced)}; check the game, then re-record with --record")
+
+
+if __name__ == '__main__':
+    main()
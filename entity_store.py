@@ -0,0 +1,211 @@
+from itertools import repeat
+
+import numpy as np
+
+# Entity flags
+HIDDEN = 1  # Not drawn
+
+NO_OWNER = -1
+
+
+class EntityStore:
+    # Many small sprites kept as struct-of-arrays: one array per field, one row per entity,
+    # instead of an Actor and a dict each. Kinds are the sprite types (one image each) and are
+    # drawn in the order they were added, each with a single Surface.blits() call; labels are
+    # rendered once per distinct text and drawn with one more. Code that wants an Actor-like
+    # object gets an EntityView, which is only a handle on a row.
+    def __init__(self, render_label, capacity=64):
+        self.render_label = render_label  # text -> Surface
+        self.kind_names = []
+        self.kind_ids = {}
+        self.images = []
+        self.sizes = np.zeros((0, 2))
+        self.label_texts = []
+        self.label_ids = {}
+        self.label_surfaces = []
+        self.label_sizes = np.zeros((0, 2))
+        self.count = 0
+
+        self.pos = np.zeros((capacity, 2))
+        self.prev = np.zeros((capacity, 2))  # Position one logic step ago, for interpolation
+        self.kind = np.zeros(capacity, dtype=np.int16)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self.owner = np.full(capacity, NO_OWNER, dtype=np.int32)  # Id of the entity this one sits on
+        self.label = np.full(capacity, -1, dtype=np.int32)
+        self.label_offset = np.zeros((capacity, 2), dtype=np.int16)  # From pos to the label's top left
+
+    def __len__(self):
+        return self.count
+
+    def add_kind(self, name, image):
+        self.kind_ids[name] = len(self.kind_names)
+        self.kind_names.append(name)
+        self.images.append(image)
+        self.sizes = np.vstack([self.sizes, image.get_size()])
+
+    def label_id(self, text):
+        label = self.label_ids.get(text)
+        if label is None:
+            label = self.label_ids[text] = len(self.label_texts)
+            surface = self.render_label(text)
+            self.label_texts.append(text)
+            self.label_surfaces.append(surface)
+            self.label_sizes = np.vstack([self.label_sizes, surface.get_size()])
+        return label
+
+    def add(self, kind, pos=(0, 0), label=None):
+        # Returns a view of the new entity
+        if self.count == len(self.pos):
+            self.grow()
+        i = self.count
+        self.count += 1
+        self.pos[i] = self.prev[i] = pos
+        self.kind[i] = self.kind_ids[kind]
+        self.flags[i] = 0
+        self.owner[i] = NO_OWNER
+        self.label[i] = -1 if label is None else self.label_id(label)
+        self.label_offset[i] = 0
+        return EntityView(self, i)
+
+    def grow(self):
+        for field in ('pos', 'prev', 'kind', 'flags', 'owner', 'label', 'label_offset'):
+            array = getattr(self, field)
+            grown = np.empty((len(array) * 2,) + array.shape[1:], dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, field, grown)
+
+    def snapshot(self):
+        # Call at the start of every logic step so draw() can interpolate from here
+        self.prev[:self.count] = self.pos[:self.count]
+
+    def reset(self):
+        # Every entity visible, on nothing, with its label at its position
+        n = self.count
+        self.flags[:n] = 0
+        self.owner[:n] = NO_OWNER
+        self.label_offset[:n] = 0
+
+    def draw(self, surface, offset=(0, 0), alpha=1.0):
+        # Visible entities anchored at their centers, alpha of the way from their previous to
+        # their current position and shifted by offset. Anything off surface is skipped.
+        n = self.count
+        width, height = surface.get_size()
+        pos = self.prev[:n] + (self.pos[:n] - self.prev[:n]) * alpha + offset
+        shown = (self.flags[:n] & HIDDEN) == 0
+        kinds = self.kind[:n]
+        for kind, image in enumerate(self.images):
+            w, h = self.sizes[kind]
+            topleft = pos - (w / 2, h / 2)
+            ids = np.flatnonzero(shown & (kinds == kind) & on_surface(topleft, w, h, width, height))
+            if len(ids):
+                surface.blits(zip(repeat(image), topleft[ids].astype(np.intp).tolist()), doreturn=False)
+
+        labels = self.label[:n]
+        ids = np.flatnonzero(shown & (labels >= 0))
+        topleft = pos[ids] + self.label_offset[ids]
+        size = self.label_sizes[labels[ids]]
+        keep = on_surface(topleft, size[:, 0], size[:, 1], width, height)
+        surfaces = self.label_surfaces
+        surface.blits([(surfaces[label], at) for label, at in
+                       zip(labels[ids[keep]].tolist(), np.rint(topleft[keep]).astype(np.intp).tolist())], doreturn=False)
+
+
+def on_surface(topleft, w, h, width, height):
+    x, y = topleft[:, 0], topleft[:, 1]
+    return (x < width) & (x + w > 0) & (y < height) & (y + h > 0)
+
+
+class EntityView:
+    # Actor-like access to one entity in an EntityStore. Holds nothing but the store and the
+    # row, so any number of views of the same entity are equal and interchangeable.
+    __slots__ = ('store', 'id')
+
+    def __init__(self, store, id):
+        self.store = store
+        self.id = id
+
+    def __eq__(self, other):
+        return isinstance(other, EntityView) and other.id == self.id and other.store is self.store
+
+    def __hash__(self):
+        return self.id
+
+    def __repr__(self):
+        return f'<{self.kind} {self.id} at {self.pos}>'
+
+    @property
+    def kind(self):
+        return self.store.kind_names[self.store.kind[self.id]]
+
+    @property
+    def label(self):
+        label = self.store.label[self.id]
+        return None if label < 0 else self.store.label_texts[label]
+
+    @property
+    def image(self):
+        return self.store.images[self.store.kind[self.id]]
+
+    @property
+    def pos(self):
+        x, y = self.store.pos[self.id].tolist()
+        return (x, y)
+
+    @pos.setter
+    def pos(self, pos):
+        self.store.pos[self.id] = pos
+
+    def teleport(self, pos):
+        # Moves without drawing the in-between position
+        self.store.pos[self.id] = self.store.prev[self.id] = pos
+
+    @property
+    def x(self):
+        return float(self.store.pos[self.id, 0])
+
+    @property
+    def y(self):
+        return float(self.store.pos[self.id, 1])
+
+    @property
+    def topleft(self):
+        w, h = self.store.sizes[self.store.kind[self.id]]
+        return (self.x - w / 2, self.y - h / 2)
+
+    @property
+    def left(self):
+        return self.topleft[0]
+
+    @property
+    def top(self):
+        return self.topleft[1]
+
+    @property
+    def right(self):
+        return self.left + self.store.sizes[self.store.kind[self.id], 0]
+
+    @property
+    def bottom(self):
+        return self.top + self.store.sizes[self.store.kind[self.id], 1]
+
+    def set_flag(self, flag, on=True):
+        flags = int(self.store.flags[self.id])
+        self.store.flags[self.id] = flags | flag if on else flags & ~flag
+
+    @property
+    def owner(self):
+        owner = int(self.store.owner[self.id])
+        return None if owner == NO_OWNER else EntityView(self.store, owner)
+
+    @owner.setter
+    def owner(self, owner):
+        self.store.owner[self.id] = NO_OWNER if owner is None else owner.id
+
+    @property
+    def label_offset(self):
+        dx, dy = self.store.label_offset[self.id].tolist()
+        return (dx, dy)
+
+    @label_offset.setter
+    def label_offset(self, offset):
+        self.store.label_offset[self.id] = offset
@@ -0,0 +1,64 @@
+import numpy as np
+
+from maze_grid import PATH
+
+# Moves in the order the direction table indexes them; the last one stays put
+STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1), (0, 0))
+STAY = len(STEPS) - 1
+
+
+class FlowField:
+    # Distances from every open cell to one target cell, plus the downhill step out of each
+    # cell. It's rebuilt only when the target moves to another cell, and following it costs
+    # one lookup per chaser however many chasers there are.
+    def __init__(self, grid):
+        self.grid = grid
+        self.width = grid.cols + 2
+        # The grid flattened with a one cell wall border, so neighbours never wrap or go out of range
+        self.open = np.pad(grid.cells == PATH, 1).ravel()
+        self.offsets = np.array([dy * self.width + dx for dx, dy in STEPS[:STAY]])
+        rows, cols = np.indices(grid.cells.shape)
+        self.inner = ((rows + 1) * self.width + cols + 1).ravel()
+        self.target = None
+        self.distance = None  # (rows, cols) steps to the target, -1 where it can't be reached
+        self.steps = None  # (rows, cols) index into STEPS
+        self.builds = 0
+
+    def update(self, target):
+        # Call with the target's cell every step; returns True if the field was rebuilt
+        if target == self.target:
+            return False
+        self.target = target
+        distance = self.search(target)
+        self.distance = distance[self.inner].reshape(self.grid.cells.shape)
+        self.steps = self.downhill(distance)
+        self.builds += 1
+        return True
+
+    def search(self, target):
+        # Breadth-first search one level at a time, with each level expanded as a single array op
+        distance = np.full(self.open.size, -1, dtype=np.int32)
+        if not self.grid.is_open(target):
+            return distance
+        frontier = np.array([(target[1] + 1) * self.width + target[0] + 1])
+        distance[frontier] = 0
+        level = 0
+        while frontier.size:
+            level += 1
+            reached = (frontier[:, None] + self.offsets).ravel()
+            frontier = np.unique(reached[self.open[reached] & (distance[reached] < 0)])
+            distance[frontier] = level
+        return distance
+
+    def downhill(self, distance):
+        # The neighbour with the lowest distance out of every cell. Staying put comes last, so
+        # it only wins at the target, which has no lower neighbour.
+        far = np.where(distance >= 0, distance, np.iinfo(np.int32).max)
+        neighbours = np.stack([far[self.inner + offset] for offset in self.offsets] + [far[self.inner]])
+        steps = neighbours.argmin(axis=0)
+        steps[distance[self.inner] < 0] = STAY
+        return steps.reshape(self.grid.cells.shape)
+
+    def next_cell(self, cell):
+        dx, dy = STEPS[self.steps[cell[1], cell[0]]]
+        return (cell[0] + dx, cell[1] + dy)
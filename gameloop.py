@@ -0,0 +1,94 @@
+import pygame
+
+INPUT_POLL_MS = 5  # How often wait_for_queued_input() looks at the queue
+
+
+class FixedStep:
+    # Runs game logic at a fixed timestep no matter how long frames take. The leftover time
+    # after the last step is exposed as alpha (0..1) so rendering can interpolate between
+    # the previous and the current logic state.
+    def __init__(self, step_rate=60, max_steps=5):
+        self.dt = 1.0 / step_rate
+        self.max_steps = max_steps  # Per frame, so one long stall can't snowball into more stalls
+        self.accumulator = 0.0
+        self.alpha = 0.0
+        self.excluded = 0.0  # Seconds of the next frame_time that weren't game time
+        self.frames = 0
+        self.steps = 0
+        self.caught_up = 0  # Extra steps run because a frame took longer than one timestep
+        self.skipped = 0  # Steps dropped because a frame took longer than max_steps timesteps
+
+    def advance(self, frame_time, step):
+        # Call once per frame with the seconds since the last frame; step(dt) is the logic update
+        self.frames += 1
+        self.accumulator += max(frame_time - self.excluded, 0.0)
+        self.excluded = 0.0
+        steps = 0
+        while self.accumulator >= self.dt and steps < self.max_steps:
+            step(self.dt)
+            self.accumulator -= self.dt
+            steps += 1
+        if self.accumulator >= self.dt:
+            dropped = int(self.accumulator // self.dt)
+            self.skipped += dropped
+            self.accumulator -= dropped * self.dt
+        self.steps += steps
+        self.caught_up += max(steps - 1, 0)
+        self.alpha = self.accumulator / self.dt
+        return self.alpha
+
+    def exclude(self, seconds):
+        # The next frame_time will include seconds that weren't game time, such as a sleep on a
+        # static screen by a loop that doesn't own the clock; advance() takes them off it
+        self.excluded = seconds
+        self.accumulator = 0.0
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'steps': self.steps,
+            'caught_up': self.caught_up,
+            'skipped': self.skipped,
+        }
+
+
+class GameLoop(FixedStep):
+    # FixedStep plus frame pacing: pace() sleeps to hold render_fps and measures the real frame time
+    def __init__(self, step_rate=60, render_fps=60, max_steps=5):
+        super().__init__(step_rate, max_steps)
+        self.render_fps = render_fps
+        self.clock = pygame.time.Clock()
+
+    def pace(self):
+        # Sleeps to hold render_fps and returns the seconds since the last frame
+        return self.clock.tick(self.render_fps) / 1000.0
+
+    def wait_for_input(self, timeout_ms):
+        event = wait_for_input(timeout_ms)
+        # The time spent waiting isn't game time, so nothing should try to catch up on it
+        self.clock.tick()
+        self.accumulator = 0.0
+        return event
+
+
+def wait_for_input(timeout_ms):
+    # Blocks until an event arrives or timeout_ms passes. Returns the event, or None on a
+    # timeout. The event is taken off the queue, so the caller has to handle it before
+    # anything still queued; posting it back would put it behind events that came after it.
+    event = pygame.event.wait(timeout_ms)
+    return None if event.type == pygame.NOEVENT else event
+
+
+def wait_for_queued_input(timeout_ms, poll_ms=INPUT_POLL_MS):
+    # Like wait_for_input() but leaves every event on the queue, for loops that read the queue
+    # themselves (pgzero's). Returns True if an event arrived.
+    deadline = pygame.time.get_ticks() + timeout_ms
+    while not pygame.event.peek():
+        if pygame.time.get_ticks() >= deadline:
+            return False
+        pygame.time.wait(poll_ms)
+    return True
+
+
+def lerp(a, b, alpha):
+    return a + (b - a) * alpha
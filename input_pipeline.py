@@ -0,0 +1,43 @@
+import pygame
+
+# Closing the window ends the game. A game drawing into its own pygame._sdl2 Window doesn't
+# get QUIT for it, only WINDOWCLOSE.
+QUIT_EVENTS = (pygame.QUIT, pygame.WINDOWCLOSE)
+
+
+def coalesce_motion(events):
+    # A burst of MOUSEMOTION events collapses to the latest one. Runs are only merged when
+    # they're back to back, so a motion before a click or release is never reordered past it.
+    coalesced = []
+    for event in events:
+        if event.type == pygame.MOUSEMOTION and coalesced and coalesced[-1].type == pygame.MOUSEMOTION:
+            coalesced[-1] = event
+        else:
+            coalesced.append(event)
+    return coalesced
+
+
+class InputPipeline:
+    # Drains the event queue once per frame and dispatches through a per-state handler table:
+    # {state: {event type: handler(event)}}. Handlers under the None state run in every state.
+    def __init__(self, handlers, get_state, allowed):
+        self.handlers = handlers
+        self.get_state = get_state
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed([*QUIT_EVENTS, *allowed])
+
+    def pump(self, first=None):
+        # Returns False once the window has been closed. first is an event already taken off
+        # the queue (by gameloop.wait_for_input()); it's handled before everything queued after it.
+        events = pygame.event.get()
+        if first is not None:
+            events.insert(0, first)
+        for event in coalesce_motion(events):
+            if event.type in QUIT_EVENTS:
+                return False
+            handler = self.handlers.get(self.get_state(), {}).get(event.type)
+            if handler is None:
+                handler = self.handlers.get(None, {}).get(event.type)
+            if handler is not None:
+                handler(event)
+        return True
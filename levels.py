@@ -0,0 +1,204 @@
+import argparse
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+
+import numpy as np
+
+from asset_cache import write_atomic
+from flow_field import FlowField
+from maze_grid import PATH, MazeGrid
+from maze_rules import MALWARE_COUNT, MIN_MALWARE_DISTANCE, RESOURCE_TYPES, START_CELL, VM_REQUIREMENTS, spawn_cells
+
+# Pre-validated levels for pygame2nd.py, written by `python levels.py`
+LEVEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'levels.bin')
+
+# magic, version, level count; then one index entry per level, sorted easiest first
+HEADER = struct.Struct('<4sHI')
+MAGIC = b'LVLS'
+VERSION = 1
+INDEX_ENTRY = struct.Struct('<QIf')  # record offset, seed, difficulty
+RECORD_HEADER = struct.Struct('<HHH')  # cols, rows, spawn count; then the spawn cells and the packed maze bits
+SPAWN = struct.Struct('<HH')
+
+SPAWN_COUNT = len(RESOURCE_TYPES) + len(VM_REQUIREMENTS) + MALWARE_COUNT
+MAX_TRIES_PER_LEVEL = 50  # build_levels() gives up after trying this many seeds per level asked for
+MALWARE_WEIGHT = 4.0  # Difficulty added per cell a malware spawns inside MALWARE_NEAR of the start
+MALWARE_NEAR = 15
+
+
+def generate_maze(seed, cols, rows, loops=0.08):
+    # A random depth-first maze on the odd cells, with a fraction of the walls between two
+    # corridors knocked out so there are loops to dodge malware around. Sizes should be odd.
+    rng = random.Random(seed)
+    cells = np.zeros((rows, cols), dtype=np.uint8)
+    cells[START_CELL[1], START_CELL[0]] = PATH
+    stack = [START_CELL]
+    while stack:
+        col, row = stack[-1]
+        options = [(col + dx, row + dy, dx, dy) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                   if 0 < col + dx < cols - 1 and 0 < row + dy < rows - 1 and not cells[row + dy, col + dx]]
+        if not options:
+            stack.pop()
+            continue
+        next_col, next_row, dx, dy = rng.choice(options)
+        cells[row + dy // 2, col + dx // 2] = PATH
+        cells[next_row, next_col] = PATH
+        stack.append((next_col, next_row))
+
+    for row in range(1, rows - 1):
+        for col in range(1, cols - 1):
+            if cells[row, col] or rng.random() >= loops:
+                continue
+            if (cells[row, col - 1] and cells[row, col + 1]) or (cells[row - 1, col] and cells[row + 1, col]):
+                cells[row, col] = PATH
+    return cells
+
+
+def build_level(seed, cols, rows):
+    # Generates and validates one level. Returns None if it's rejected, otherwise
+    # (seed, cells, spawns, difficulty). Runs in the worker processes.
+    cells = generate_maze(seed, cols, rows)
+    grid = MazeGrid(cells)
+    spawns = spawn_cells(grid, SPAWN_COUNT, random.Random(seed))
+    if len(spawns) < SPAWN_COUNT:
+        return None
+
+    flow = FlowField(grid)
+    flow.update(START_CELL)
+    distances = [int(flow.distance[row, col]) for col, row in spawns]
+    if min(distances) < 0:
+        return None
+    targets = distances[:len(RESOURCE_TYPES) + len(VM_REQUIREMENTS)]
+    malware = distances[len(targets):]
+    if malware and min(malware) < MIN_MALWARE_DISTANCE:
+        return None
+    # Longer walks to every resource and VM, and malware starting close by, make a level harder
+    difficulty = sum(targets) + MALWARE_WEIGHT * sum(max(MALWARE_NEAR - d, 0) for d in malware)
+    return seed, cells, spawns, difficulty
+
+
+def build_level_args(args):
+    return build_level(*args)
+
+
+def build_levels(count, cols, rows, first_seed=0, workers=None, max_tries=None):
+    # Farms generation and validation out to a process pool until count levels are accepted or
+    # max_tries seeds (default MAX_TRIES_PER_LEVEL per level) have been tried, so a size no level
+    # can pass at doesn't spin forever. Returns fewer than count levels in that case.
+    if max_tries is None:
+        max_tries = count * MAX_TRIES_PER_LEVEL
+    accepted = []
+    tried = 0
+    with multiprocessing.Pool(workers) as pool:
+        seed = first_seed
+        while len(accepted) < count and tried < max_tries:
+            batch = [(s, cols, rows) for s in range(seed, seed + min(max(count - len(accepted), 64), max_tries - tried))]
+            seed += len(batch)
+            tried += len(batch)
+            for level in pool.imap_unordered(build_level_args, batch, chunksize=16):
+                if level is not None:
+                    accepted.append(level)
+    accepted.sort(key=lambda level: level[0])
+    return accepted[:count], tried
+
+
+def write_levels(path, levels):
+    # Index first so a level can be found without reading the others; easiest levels first
+    levels = sorted(levels, key=lambda level: level[3])
+    records = []
+    for seed, cells, spawns, difficulty in levels:
+        rows, cols = cells.shape
+        record = RECORD_HEADER.pack(cols, rows, len(spawns))
+        record += b''.join(SPAWN.pack(col, row) for col, row in spawns)
+        records.append(record + np.packbits(cells).tobytes())
+
+    offset = HEADER.size + INDEX_ENTRY.size * len(levels)
+    index = []
+    for (seed, cells, spawns, difficulty), record in zip(levels, records):
+        index.append(INDEX_ENTRY.pack(offset, seed, difficulty))
+        offset += len(record)
+
+    write_atomic(path, [HEADER.pack(MAGIC, VERSION, len(levels)), b''.join(index), b''.join(records)])
+
+
+class LevelCache:
+    # Read-only view of a level file. Opening it only reads the header; each level is decoded
+    # from the memory map when it's asked for.
+    def __init__(self, path=LEVEL_FILE):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} level file')
+        if self.count and self.record_end(self.count - 1) > len(self.data):
+            raise ValueError(f'{path} is truncated')
+
+    def __len__(self):
+        return self.count
+
+    def entry(self, number):
+        return INDEX_ENTRY.unpack_from(self.data, HEADER.size + INDEX_ENTRY.size * number)
+
+    def record_end(self, number):
+        # Records are written in index order, so the last one ending in the file means they all do
+        offset = self.entry(number)[0]
+        cols, rows, spawn_count = RECORD_HEADER.unpack_from(self.data, offset)
+        return offset + RECORD_HEADER.size + SPAWN.size * spawn_count + (rows * cols + 7) // 8
+
+    def load(self, number):
+        offset, seed, difficulty = self.entry(number)
+        cols, rows, spawn_count = RECORD_HEADER.unpack_from(self.data, offset)
+        offset += RECORD_HEADER.size
+        spawns = [SPAWN.unpack_from(self.data, offset + SPAWN.size * i) for i in range(spawn_count)]
+        offset += SPAWN.size * spawn_count
+        bits = np.frombuffer(self.data, dtype=np.uint8, count=(rows * cols + 7) // 8, offset=offset)
+        cells = np.unpackbits(bits, count=rows * cols).reshape(rows, cols)
+        return {'seed': seed, 'cells': cells, 'spawns': spawns, 'difficulty': difficulty}
+
+    def close(self):
+        self.data.close()
+
+
+def open_levels(path=LEVEL_FILE):
+    # The level file if it's been built, otherwise None
+    try:
+        return LevelCache(path)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate, validate and store levels for pygame2nd.py')
+    parser.add_argument('--count', type=int, default=1000, help='levels to keep')
+    parser.add_argument('--size', default='31x23', help='maze size in cells, COLSxROWS (odd numbers)')
+    parser.add_argument('--seed', type=int, default=0, help='first seed to try')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--max-tries', type=int, default=None,
+                        help=f'seeds to try before giving up (default: {MAX_TRIES_PER_LEVEL} per level)')
+    parser.add_argument('--out', default=LEVEL_FILE)
+    args = parser.parse_args()
+
+    # A VM needing a resource type that's never spawned can't be solved on any level
+    unspawned = {kind for requirement in VM_REQUIREMENTS for kind in requirement} - set(RESOURCE_TYPES)
+    if unspawned:
+        sys.exit(f"VM_REQUIREMENTS needs {', '.join(sorted(unspawned))}, which RESOURCE_TYPES never spawns")
+
+    cols, rows = (int(n) for n in args.size.lower().split('x'))
+    if cols % 2 == 0 or rows % 2 == 0:
+        sys.exit('--size needs odd numbers so the maze has a wall border')
+    start = time.perf_counter()
+    levels, tried = build_levels(args.count, cols, rows, args.seed, args.workers, args.max_tries)
+    if len(levels) < args.count:
+        sys.exit(f'Only {len(levels)} of {tried} levels passed validation at {cols}x{rows}; '
+                 'try a bigger --size or a higher --max-tries')
+    write_levels(args.out, levels)
+    print(f'Kept {len(levels)} of {tried} levels in {time.perf_counter() - start:.1f} s -> {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import random
+
+import numpy as np
+
+from flow_field import STEPS, FlowField
+from maze_grid import MazeGrid
+from maze_rules import (CLOUD_HITBOX, CLOUD_SPEED, MALWARE_COUNT, MALWARE_SPEED, MAZE, RESOURCE_TYPES, START_CELL,
+                        STEP_RATE, VM_REQUIREMENTS, contact_tables, malware_cells, resolve_contacts, respawn_cells,
+                        spawn_cells)
+from vm_board import Inventory, ResourceTypes, VMBoard
+
+# Actions index this table: the direction the cloud moves in for one step
+ACTIONS = np.array([(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1)])
+
+REWARD_PLACED = 1.0  # Per resource placed on a VM
+REWARD_SOLVED = 10.0  # When the last VM is solved
+REWARD_HIT = -1.0  # When malware sends the cloud back to the start
+
+
+class MazeEnv:
+    # num_envs independent Cloud Resource Manager games stepped together, with no window.
+    # The state is kept as struct-of-arrays (one array per field, one row per game), the rules
+    # are the ones in maze_rules.py, and movement and contact tests are vectorized across games.
+    # Only the games with a contact go through resolve_contacts(), with their own VMBoard and
+    # Inventory, the same way pygame2nd.py does. Each game has its own random.Random, so any
+    # one of them can be replayed from its seed.
+    def __init__(self, num_envs, seed=0, grid=None, max_steps=STEP_RATE * 120,
+                 resource_types=RESOURCE_TYPES, vm_requirements=VM_REQUIREMENTS, malware_count=MALWARE_COUNT):
+        self.num_envs = num_envs
+        self.grid = grid if grid is not None else MazeGrid(MAZE)
+        self.max_steps = max_steps
+        self.dt = 1.0 / STEP_RATE
+        self.start = np.array(self.grid.cell_center(START_CELL), dtype=np.float64)
+        self.contacts = contact_tables()
+        self.far_cells = respawn_cells(self.grid, self.contacts['malware'].reach)
+
+        types = ResourceTypes()
+        self.resource_kinds = list(resource_types)
+        self.resource_bits = [types.bit(kind) for kind in resource_types]  # Indexed by resource
+        self.resources_by_kind = {}  # Kind -> indices of the resources of that kind, for their ContactTable
+        for r, kind in enumerate(resource_types):
+            self.resources_by_kind.setdefault(kind, []).append(r)
+        self.num_resources, self.num_vms, self.num_malware = len(resource_types), len(vm_requirements), malware_count
+        # Which VMs need what and what each game's cloud is carrying; resources and VMs are their indices
+        self.boards = [VMBoard(types) for _ in range(num_envs)]
+        for board in self.boards:
+            for v, requirement in enumerate(vm_requirements):
+                board.add(v, requirement)
+        self.inventories = [Inventory() for _ in range(num_envs)]
+
+        # The state, one row per game
+        n, r, v, m = num_envs, self.num_resources, self.num_vms, malware_count
+        self.cloud = np.zeros((n, 2))
+        self.resources = np.zeros((n, r, 2))
+        self.collected = np.zeros((n, r), dtype=bool)
+        self.vm_pos = np.zeros((n, v, 2))
+        self.vm_filled = np.zeros((n, v), dtype=np.int64)
+        self.unsolved = np.zeros(n, dtype=np.int64)
+        self.malware = np.zeros((n, m, 2))
+        self.steps = np.zeros(n, dtype=np.int64)
+
+        # Downhill steps towards every open cell the cloud has stood in, filled in as they're
+        # needed; memory is open cells x cells bytes
+        self.flow = FlowField(self.grid)
+        self.open_index = np.full(self.grid.cells.size, -1, dtype=np.intp)
+        self.open_index[self.grid.free] = np.arange(len(self.grid.free))
+        self.flow_steps = np.zeros((len(self.grid.free), self.grid.cells.size), dtype=np.uint8)
+        self.flow_built = np.zeros(len(self.grid.free), dtype=bool)
+        self.step_offsets = np.array(STEPS)
+
+        self.seed(seed)
+
+    def seed(self, seed):
+        # seed is an int for the whole batch or one seed per game
+        if isinstance(seed, int):
+            seed = np.random.SeedSequence(seed).generate_state(self.num_envs).tolist()
+        self.seeds = list(seed)
+        self.rngs = [random.Random(s) for s in self.seeds]
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed(seed)
+        self.reset_envs(range(self.num_envs))
+        return self.observation()
+
+    def reset_envs(self, indices):
+        count = self.num_resources + self.num_vms
+        for i in indices:
+            cells = spawn_cells(self.grid, count, self.rngs[i])
+            cells += malware_cells(self.grid, self.far_cells, cells, self.num_malware, self.rngs[i])
+            centers = np.array([self.grid.cell_center(cell) for cell in cells], dtype=np.float64)
+            self.resources[i] = centers[:self.num_resources]
+            self.vm_pos[i] = centers[self.num_resources:self.num_resources + self.num_vms]
+            self.malware[i] = centers[self.num_resources + self.num_vms:]
+        indices = list(indices)
+        self.cloud[indices] = self.start
+        for i in indices:
+            self.boards[i].reset()
+            self.inventories[i].clear()
+            self.unsolved[i] = self.boards[i].unsolved
+        self.collected[indices] = False
+        self.vm_filled[indices] = 0
+        self.steps[indices] = 0
+
+    def observation(self):
+        # Views of the live state arrays; copy them to keep them past the next step
+        return {
+            'cloud': self.cloud,
+            'resources': self.resources,
+            'collected': self.collected,
+            'vms': self.vm_pos,
+            'vm_filled': self.vm_filled,
+            'malware': self.malware,
+        }
+
+    def step(self, actions):
+        # actions is one index into ACTIONS per game. Returns (observation, rewards, dones);
+        # finished games are reset before returning, so their observation is the new game's.
+        rewards = np.zeros(self.num_envs)
+        self.move_cloud(ACTIONS[actions])
+        self.move_malware()
+
+        touched_resources = np.zeros((self.num_envs, self.num_resources), dtype=bool)
+        for kind, of_kind in self.resources_by_kind.items():
+            touched_resources[:, of_kind] = self.touching(self.resources[:, of_kind], self.contacts[kind])
+        touched_vms = self.touching(self.vm_pos, self.contacts['vm'])
+        touched_malware = self.touching(self.malware, self.contacts['malware'])
+        any_contact = touched_resources.any(axis=1) | touched_vms.any(axis=1) | touched_malware.any(axis=1)
+        for i in np.flatnonzero(any_contact).tolist():
+            self.resolve(i, touched_resources[i], touched_vms[i], touched_malware[i], rewards)
+
+        solved = self.unsolved == 0
+        rewards[solved] += REWARD_SOLVED
+        self.steps += 1
+        dones = solved | (self.steps >= self.max_steps)
+        if dones.any():
+            self.reset_envs(np.flatnonzero(dones).tolist())
+        return self.observation(), rewards, dones
+
+    def move_cloud(self, directions):
+        half = CLOUD_HITBOX / 2
+        distance = CLOUD_SPEED * self.dt
+        left, top = self.grid.sweep_batch(self.cloud[:, 0] - half, self.cloud[:, 1] - half, CLOUD_HITBOX, CLOUD_HITBOX,
+                                          directions[:, 0] * distance, directions[:, 1] * distance)
+        self.cloud[:, 0] = left + half
+        self.cloud[:, 1] = top + half
+
+    def move_malware(self):
+        # maze_rules.chase for every malware in every game at once
+        grid, size = self.grid, self.grid.cell_size
+        cloud_cells = (self.cloud // size).astype(np.intp)
+        targets = self.open_index[cloud_cells[:, 1] * grid.cols + cloud_cells[:, 0]]
+        for target in np.unique(targets[~self.flow_built[targets]]):
+            row, col = divmod(int(grid.free[target]), grid.cols)
+            self.flow.update((col, row))
+            self.flow_steps[target] = self.flow.steps.ravel()
+            self.flow_built[target] = True
+
+        cells = (self.malware // size).astype(np.intp)
+        moves = self.flow_steps[targets[:, None], cells[..., 1] * grid.cols + cells[..., 0]]
+        center = cells * size + size // 2
+        aim = (cells + self.step_offsets[moves]) * size + size // 2
+        x, y = self.malware[..., 0], self.malware[..., 1]
+        turning = ((aim[..., 0] != center[..., 0]) & (y != center[..., 1])) | ((aim[..., 1] != center[..., 1]) & (x != center[..., 0]))
+        aim = np.where(turning[..., None], center, aim)
+        delta = aim - self.malware
+        length = np.hypot(delta[..., 0], delta[..., 1])[..., None]
+        distance = MALWARE_SPEED * self.dt
+        self.malware[:] = np.where(length <= distance, aim, self.malware + delta * distance / np.maximum(length, 1e-9))
+
+    def touching(self, positions, contact):
+        # (games, actors) True where the cloud touches that actor; contact is its ContactTable
+        delta = positions - self.cloud[:, None]
+        return contact.touching(delta[..., 0], delta[..., 1])
+
+    def resolve(self, i, touched_resources, touched_vms, touched_malware, rewards):
+        # maze_rules.resolve_contacts for game i, then its state arrays are brought up to date
+        board = self.boards[i]
+        collected, placed, hit = resolve_contacts(
+            board, self.inventories[i], self.resource_bits, np.flatnonzero(touched_resources).tolist(),
+            np.flatnonzero(touched_vms).tolist(), np.flatnonzero(touched_malware).tolist())
+        self.collected[i, collected] = True
+        for r, v, slot in placed:
+            self.collected[i, r] = False
+            self.resources[i, r] = self.vm_pos[i, v]
+            self.vm_filled[i, v] = board.filled[v]
+        rewards[i] += REWARD_PLACED * len(placed)
+        self.unsolved[i] = board.unsolved
+
+        if hit is not None:
+            # The cloud goes back to the start and that malware somewhere away from it
+            spots = np.concatenate([self.resources[i], self.vm_pos[i], self.malware[i]])
+            occupied = [self.grid.cell_at(pos) for pos in spots.tolist()]
+            cell, = malware_cells(self.grid, self.far_cells, occupied, 1, self.rngs[i])
+            self.malware[i, hit] = self.grid.cell_center(cell)
+            self.cloud[i] = self.start
+            rewards[i] += REWARD_HIT
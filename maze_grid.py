@@ -0,0 +1,119 @@
+import math
+import random
+from collections import deque
+
+import numpy as np
+
+WALL, PATH = 0, 1
+EPSILON = 1e-6  # Keeps a box that's flush against a wall from counting as inside it
+
+
+class MazeGrid:
+    # The maze as a uint8 array (0 = wall, 1 = path). The open cells and their connected
+    # components are worked out once here, so spawning never has to scan the grid.
+    def __init__(self, cells, cell_size=50):
+        self.cells = np.ascontiguousarray(cells, dtype=np.uint8)
+        self.rows, self.cols = self.cells.shape
+        self.cell_size = cell_size
+        self.world_size = (self.cols * cell_size, self.rows * cell_size)
+        self.free = np.flatnonzero(self.cells)  # Flat indices (row * cols + col) of open cells
+        # Walls with a one cell wall border, so sweeps never have to bounds check
+        self.solid = np.pad(self.cells == WALL, 1, constant_values=True)
+        self.labels, self.components = self.label_components()
+
+    def label_components(self):
+        # 4-connected components of the open cells: a label per cell (-1 on walls) and the
+        # flat indices of the cells in each component
+        flat = self.cells.ravel().tolist()
+        labels = [-1] * len(flat)
+        cols, size = self.cols, len(flat)
+        components = []
+        for start in self.free.tolist():
+            if labels[start] >= 0:
+                continue
+            label = len(components)
+            labels[start] = label
+            members = [start]
+            queue = deque(members)
+            while queue:
+                i = queue.popleft()
+                col = i % cols
+                for j in (i - 1 if col else -1, i + 1 if col < cols - 1 else -1, i - cols, i + cols):
+                    if 0 <= j < size and flat[j] and labels[j] < 0:
+                        labels[j] = label
+                        members.append(j)
+                        queue.append(j)
+            components.append(np.array(members, dtype=np.intp))
+        return np.array(labels, dtype=np.int32).reshape(self.cells.shape), components
+
+    def is_open(self, cell):
+        col, row = cell
+        return 0 <= row < self.rows and 0 <= col < self.cols and self.cells[row, col] == PATH
+
+    def cell_at(self, pos):
+        return (int(pos[0] // self.cell_size), int(pos[1] // self.cell_size))
+
+    def cell_center(self, cell):
+        return (cell[0] * self.cell_size + self.cell_size // 2, cell[1] * self.cell_size + self.cell_size // 2)
+
+    def sample(self, count, reachable_from, exclude=(), rng=random):
+        # Up to count distinct open cells in the same component as reachable_from, none of
+        # them in exclude. Costs O(count + len(exclude)) whatever the size of the maze.
+        component = self.components[self.labels[reachable_from[1], reachable_from[0]]]
+        excluded = {row * self.cols + col for col, row in exclude}
+        picks = rng.sample(range(len(component)), min(count + len(excluded), len(component)))
+        cells = [divmod(int(component[i]), self.cols) for i in picks if component[i] not in excluded]
+        return [(col, row) for row, col in cells[:count]]
+
+    def sweep(self, rect, dx, dy):
+        # Moves the box rect = (left, top, width, height) by (dx, dy) one axis at a time and
+        # stops it flush against the first wall in its way, so it can't tunnel through walls
+        # or clip corners however far it moves in one step. Returns the new (left, top).
+        left, top, width, height = rect
+        left = self.sweep_axis(self.solid, left, width, top, height, dx)
+        top = self.sweep_axis(self.solid.T, top, height, left, width, dy)
+        return left, top
+
+    def sweep_axis(self, solid, start, length, across, across_length, delta):
+        # solid is indexed [lane, cell along the movement]; indices are shifted by the border
+        if not delta:
+            return start
+        size = self.cell_size
+        lanes = solid[max(math.floor(across / size + EPSILON) + 1, 0):math.ceil((across + across_length) / size - EPSILON) + 1]
+        if delta > 0:
+            first = math.ceil((start + length) / size - EPSILON)
+            last = math.ceil((start + length + delta) / size - EPSILON) - 1
+            if last >= first:
+                blocked = lanes[:, first + 1:last + 2].any(axis=0)
+                if blocked.any():
+                    return (first + int(blocked.argmax())) * size - length
+        else:
+            first = math.floor((start + delta) / size + EPSILON)
+            last = math.floor(start / size + EPSILON) - 1
+            if last >= first:
+                blocked = lanes[:, max(first + 1, 0):last + 2].any(axis=0)
+                if blocked.any():
+                    return (last - int(blocked[::-1].argmax()) + 1) * size
+        return start + delta
+
+    def sweep_batch(self, left, top, width, height, dx, dy):
+        # sweep() for arrays of same-sized boxes. Every move has to be shorter than a cell and
+        # the box no bigger than one, so a box edge enters at most one new cell per axis.
+        left = self.sweep_batch_axis(self.solid, left, width, top, height, dx)
+        top = self.sweep_batch_axis(self.solid.T, top, height, left, width, dy)
+        return left, top
+
+    def sweep_batch_axis(self, solid, start, length, across, across_length, delta):
+        size = self.cell_size
+        lanes, cells = solid.shape
+        first_lane = np.clip(np.floor(across / size + EPSILON).astype(np.intp) + 1, 0, lanes - 1)
+        last_lane = np.clip(np.ceil((across + across_length) / size - EPSILON).astype(np.intp), 0, lanes - 1)
+        forward = delta > 0
+        # The cell the leading edge would move into, and the furthest cell it reaches
+        ahead = np.where(forward, np.ceil((start + length) / size - EPSILON), np.floor(start / size + EPSILON) - 1).astype(np.intp)
+        reach = np.where(forward, np.ceil((start + length + delta) / size - EPSILON) - 1, np.floor((start + delta) / size + EPSILON)).astype(np.intp)
+        entering = (delta != 0) & np.where(forward, reach >= ahead, reach <= ahead)
+        cell = np.clip(ahead + 1, 0, cells - 1)
+        blocked = entering & (solid[first_lane, cell] | solid[last_lane, cell])
+        stop = np.where(forward, ahead * size - length, (ahead + 1) * size)
+        return np.where(blocked, stop, start + delta)
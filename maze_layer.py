@@ -0,0 +1,65 @@
+import pygame
+
+
+class Camera:
+    # The part of the world that's on screen. Smaller worlds just sit at the top left.
+    def __init__(self, view_size, world_size):
+        self.rect = pygame.Rect((0, 0), view_size)
+        self.world_size = world_size
+
+    def follow(self, pos):
+        x = min(max(int(pos[0]) - self.rect.width // 2, 0), max(self.world_size[0] - self.rect.width, 0))
+        y = min(max(int(pos[1]) - self.rect.height // 2, 0), max(self.world_size[1] - self.rect.height, 0))
+        self.rect.topleft = (x, y)
+
+    def to_screen(self, pos):
+        return (pos[0] - self.rect.x, pos[1] - self.rect.y)
+
+
+class MazeLayer:
+    # The maze walls, pre-rendered into square chunks the first time each one is on screen.
+    # Only the chunks the camera can see are blitted, so the per-frame cost follows the
+    # window size rather than the maze size. Call set_maze() whenever the maze changes.
+    def __init__(self, maze, cell_size=50, chunk_cells=8, wall_color='gray', floor_color='black'):
+        self.cell_size = cell_size
+        self.chunk_cells = chunk_cells
+        self.chunk_size = cell_size * chunk_cells
+        self.wall_color = pygame.Color(wall_color)
+        self.floor_color = pygame.Color(floor_color)
+        self.set_maze(maze)
+
+    def set_maze(self, maze):
+        self.maze = maze
+        self.rows = len(maze)
+        self.cols = len(maze[0]) if len(maze) else 0
+        self.world_size = (self.cols * self.cell_size, self.rows * self.cell_size)
+        self.chunks = {}
+
+    def chunk(self, cx, cy):
+        surface = self.chunks.get((cx, cy))
+        if surface is None:
+            surface = self.chunks[(cx, cy)] = self.render_chunk(cx, cy)
+        return surface
+
+    def render_chunk(self, cx, cy):
+        col0, row0 = cx * self.chunk_cells, cy * self.chunk_cells
+        cols = min(self.chunk_cells, self.cols - col0)
+        rows = min(self.chunk_cells, self.rows - row0)
+        surface = pygame.Surface((cols * self.cell_size, rows * self.cell_size))
+        surface.fill(self.floor_color)
+        for y in range(rows):
+            row = self.maze[row0 + y]
+            for x in range(cols):
+                if row[col0 + x] == 0:
+                    surface.fill(self.wall_color, (x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size))
+        return surface
+
+    def draw(self, surface, camera):
+        view = camera.rect
+        size = self.chunk_size
+        first_x, first_y = max(view.left // size, 0), max(view.top // size, 0)
+        last_x = min((view.right - 1) // size, (self.cols - 1) // self.chunk_cells)
+        last_y = min((view.bottom - 1) // size, (self.rows - 1) // self.chunk_cells)
+        surface.blits([(self.chunk(cx, cy), (cx * size - view.x, cy * size - view.y))
+                       for cy in range(first_y, last_y + 1)
+                       for cx in range(first_x, last_x + 1)], doreturn=False)
@@ -0,0 +1,163 @@
+import os
+import random
+
+import numpy as np
+import pygame
+
+from flow_field import FlowField
+
+# The rules of Cloud Resource Manager that don't need pgzero. pygame2nd.py plays by these and
+# maze_env.py runs the same rules over many games at once: movement, the malware chase,
+# spawning, sprite contacts and what a contact does (resolve_contacts).
+STEP_RATE = 60  # Logic steps per second
+CLOUD_SPEED = 300  # Pixels per second
+CLOUD_HITBOX = 20  # Side of the box around the cloud's center that walls stop; the sprite is bigger than a corridor
+MALWARE_SPEED = 120  # Pixels per second
+START_CELL = (1, 1)
+
+# Maze layout (0 = wall, 1 = path)
+MAZE = [
+    [0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0],
+    [1,1,1,1,1,1,0,1,1,1,1,1,1,1,1,0],
+    [0,0,0,0,0,1,0,1,0,0,0,0,0,0,1,0],
+    [0,1,1,1,0,1,1,1,0,1,1,1,1,0,1,0],
+    [0,1,0,1,0,0,0,1,0,1,0,0,1,0,1,0],
+    [0,1,0,1,1,1,1,1,1,1,0,1,1,0,1,0],
+    [0,1,0,0,0,0,0,0,0,0,0,1,0,0,1,0],
+    [0,1,1,1,1,1,1,1,1,1,1,1,0,1,1,0],
+    [0,0,0,0,0,0,0,0,0,0,0,1,0,1,0,0],
+    [0,1,1,1,1,1,1,1,1,1,1,1,1,1,1,0],
+    [0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0]
+]
+
+# Resources and the VMs that need them
+RESOURCE_TYPES = ('cpu', 'memory', 'storage')
+VM_REQUIREMENTS = (('cpu', 'memory'), ('storage', 'cpu'))
+MALWARE_COUNT = 2
+MIN_MALWARE_DISTANCE = 6  # Cells of path between the start and a malware when it spawns or respawns
+
+# Every sprite's image, as a pgzero image name; the files are <name>.png next to this script.
+# Contacts are between the sprites' opaque pixels, so they depend on these images.
+SPRITES = {'cloud': 'cloud', 'vm': 'vm', 'malware': 'malware', 'cpu': 'cpu', 'memory': 'ram', 'storage': 'storage'}
+SPRITE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_sprite(kind):
+    # For code without pgzero's image loader
+    return pygame.image.load(os.path.join(SPRITE_DIR, SPRITES[kind] + '.png'))
+
+
+class ContactTable:
+    # Every center-to-center offset at which two sprites' opaque pixels overlap, worked out once
+    # from their masks with Mask.convolve(). Looking an offset up gives the same answer as
+    # Mask.overlap() on the two sprites centered that far apart, for one pair or whole arrays.
+    def __init__(self, surface_a, surface_b):
+        mask_b = pygame.mask.from_surface(surface_b)
+        offsets = pygame.mask.from_surface(surface_a).convolve(mask_b)
+        # [x, y]; set where b's top left at (x - wb + 1, y - hb + 1) from a's overlaps a
+        self.table = pygame.surfarray.array_red(offsets.to_surface()) > 0
+        (wa, ha), (wb, hb) = surface_a.get_size(), mask_b.get_size()
+        self.shift = ((wa - wb) / 2, (ha - hb) / 2)  # Center offset to top left offset
+        self.origin = (wb - 1, hb - 1)  # Top left offset to table index
+        # The centers can only touch while they're less than reach apart on both axes
+        xs, ys = np.nonzero(self.table)
+        self.reach = (float(np.abs(xs - self.origin[0] - self.shift[0]).max(initial=-1)) + 1,
+                      float(np.abs(ys - self.origin[1] - self.shift[1]).max(initial=-1)) + 1)
+
+    def touching(self, dx, dy):
+        # dx, dy: b's center minus a's, scalars or arrays. Offsets are rounded to whole pixels,
+        # halves to even like round().
+        width, height = self.table.shape
+        x = np.rint(np.asarray(dx) + self.shift[0]).astype(np.intp) + self.origin[0]
+        y = np.rint(np.asarray(dy) + self.shift[1]).astype(np.intp) + self.origin[1]
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        return inside & self.table[np.clip(x, 0, width - 1), np.clip(y, 0, height - 1)]
+
+
+def contact_tables(load=load_sprite):
+    # A ContactTable between the cloud and every other kind of sprite; load(kind) is its Surface
+    cloud = load('cloud')
+    return {kind: ContactTable(cloud, load(kind)) for kind in SPRITES if kind != 'cloud'}
+
+
+def move_cloud(grid, pos, direction, distance):
+    # Slides the cloud's hitbox along the walls; direction is (-1..1, -1..1)
+    half = CLOUD_HITBOX / 2
+    box = (pos[0] - half, pos[1] - half, CLOUD_HITBOX, CLOUD_HITBOX)
+    left, top = grid.sweep(box, direction[0] * distance, direction[1] * distance)
+    return (left + half, top + half)
+
+
+def chase(grid, flow, pos, distance):
+    # Moves a chaser up to distance pixels along the flow field, center to center between cells.
+    # It straightens up on its own cell's center before turning so it never cuts a wall corner.
+    cell = grid.cell_at(pos)
+    center = grid.cell_center(cell)
+    aim = grid.cell_center(flow.next_cell(cell))
+    if (aim[0] != center[0] and pos[1] != center[1]) or (aim[1] != center[1] and pos[0] != center[0]):
+        aim = center
+    dx, dy = aim[0] - pos[0], aim[1] - pos[1]
+    length = (dx * dx + dy * dy) ** 0.5
+    if length <= distance:
+        return aim
+    return (pos[0] + dx * distance / length, pos[1] + dy * distance / length)
+
+
+def spawn_cells(grid, count, rng=random):
+    # Distinct open cells the cloud can reach from the start, never the start itself
+    return grid.sample(count, START_CELL, exclude=[START_CELL], rng=rng)
+
+
+def respawn_cells(grid, reach):
+    # Flat indices of the open cells at least MIN_MALWARE_DISTANCE cells of path from the start
+    # whose centers are out of reach (ContactTable.reach) of the start's; walls don't stop
+    # sprites touching, they're bigger than a cell. Malware that hits the cloud reappears on one
+    # of these, away from where the cloud restarts.
+    flow = FlowField(grid)
+    flow.update(START_CELL)
+    rows, cols = np.indices(grid.cells.shape)
+    start_x, start_y = grid.cell_center(START_CELL)
+    size = grid.cell_size
+    near = (np.abs(cols * size - (start_x - size // 2)) < reach[0]) & (np.abs(rows * size - (start_y - size // 2)) < reach[1])
+    return np.flatnonzero(((flow.distance >= MIN_MALWARE_DISTANCE) & ~near).ravel())
+
+
+def respawn_cell(grid, far, occupied, rng=random):
+    # A random cell of far (from respawn_cells) that isn't in occupied, or None if they're all
+    # taken. Costs O(len(occupied)) whatever the size of the maze.
+    taken = {row * grid.cols + col for col, row in occupied}
+    for i in rng.sample(range(len(far)), min(len(taken) + 1, len(far))):
+        if int(far[i]) not in taken:
+            row, col = divmod(int(far[i]), grid.cols)
+            return (col, row)
+    return None
+
+
+def malware_cells(grid, far, occupied, count, rng=random):
+    # Cells for count malware to spawn or respawn on: from far (respawn_cells) and off occupied
+    # and each other where possible, otherwise any open cell the cloud can reach
+    cells = []
+    for _ in range(count):
+        cells.append(respawn_cell(grid, far, list(occupied) + cells, rng) or spawn_cells(grid, 1, rng)[0])
+    return cells
+
+
+def resolve_contacts(board, carried, bits, resources, vms, malware):
+    # What the cloud's contacts do in one step. resources, vms and malware are the ones it
+    # touches, each in index order, and bits[resource] is a resource's type bit. Whatever order
+    # the contacts were found in:
+    #   1. every touched resource that isn't being carried is picked up, even one on a VM
+    #   2. every touched VM takes the oldest carried resource of each type it's still missing
+    #   3. the first touched malware hits the cloud
+    # board (a VMBoard) and carried (an Inventory) are updated. Returns (collected, placed, hit):
+    # placed holds (resource, vm, slot), slot counting the resources on that VM from 0, and hit
+    # is the malware or None. Moving sprites, the reset and the respawn are up to the caller.
+    collected = [resource for resource in resources if resource not in carried]
+    for resource in collected:
+        carried.add(bits[resource], resource)
+    placed = []
+    for vm in vms:
+        for resource in carried.take(board.missing(vm)):
+            board.fill(vm, bits[resource])
+            placed.append((resource, vm, board.placed(vm) - 1))
+    return collected, placed, (malware[0] if malware else None)
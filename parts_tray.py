@@ -0,0 +1,133 @@
+import bisect
+
+import pygame
+
+from spatial_hash import SpatialHash
+
+
+class PartTray:
+    # A scrolling row of parts along the bottom of view. The row's layout (where each part sits
+    # along it) is cached and only measured again when parts are added or removed; scrolling
+    # just moves the window over it. Only the parts inside view are in the sprite group and the
+    # hit-test index, so a tray of hundreds of parts costs about what one screenful does.
+    def __init__(self, view, group, layer, spacing=10, margin=20):
+        self.view = view
+        self.group = group
+        self.layer = layer
+        self.spacing = spacing
+        self.margin = margin
+        self.parts = []
+        self.lefts = []  # Left edge of each part along the row, increasing, for bisect
+        self.rights = []  # Right edge of each part along the row, increasing
+        self.width = 0
+        self.scroll = 0
+        self.held = None  # The part being dragged; the tray leaves it where the mouse puts it
+        self.shown = {}  # Tray parts in the group that layout() placed or has to take out again
+        self.index = SpatialHash(cell_size=50)
+        self.measured = False
+        self.moved = False
+
+    def set_parts(self, parts):
+        # Replaces every part in the tray
+        self.group.remove(*self.shown)
+        self.shown.clear()
+        self.index.clear()
+        self.parts = list(parts)
+        self.held = None
+        self.scroll = 0
+        self.measured = False
+
+    def add(self, part):
+        self.parts.append(part)
+        self.measured = False
+
+    def remove(self, part):
+        # The part leaves the tray but not the sprite group; whoever took it draws it now
+        self.parts.remove(part)
+        self.shown.pop(part, None)
+        self.index.remove(part)
+        if part is self.held:
+            self.held = None
+        self.measured = False
+
+    def measure(self):
+        self.lefts, self.rights = [], []
+        x = 0
+        for part in self.parts:
+            self.lefts.append(x)
+            x += part.rect.width
+            self.rights.append(x)
+            x += self.spacing
+        self.width = self.rights[-1] if self.parts else 0
+        self.scroll = min(self.scroll, self.max_scroll())
+        self.measured = True
+
+    def max_scroll(self):
+        return max(self.width - (self.view.width - 2 * self.margin), 0)
+
+    def scroll_by(self, dx):
+        scroll = min(max(self.scroll + dx, 0), self.max_scroll())
+        if scroll != self.scroll:
+            self.scroll = scroll
+            self.moved = True
+            self.layout()
+
+    def origin(self):
+        # Screen x of the row's left end; a row that fits is centered
+        if self.width <= self.view.width - 2 * self.margin:
+            return self.view.centerx - self.width // 2
+        return self.view.left + self.margin - self.scroll
+
+    def hold(self, part):
+        # part is being dragged: it stays drawn but the tray stops placing and hit-testing it
+        self.held = part
+        self.shown.pop(part, None)
+        self.index.remove(part)
+
+    def release(self):
+        # The held part goes back to its place in the row on the next layout(), or out of the
+        # group if the tray scrolled that place out of view while it was held
+        if self.held is not None and self.held in self.parts:
+            self.shown[self.held] = None
+        self.held = None
+        self.moved = True
+
+    def layout(self):
+        # Places the visible parts and syncs the group and index with them. Does nothing
+        # unless the parts or the scroll position changed since last time.
+        if not self.measured:
+            self.measure()
+        elif not self.moved:
+            return
+        self.moved = False
+        origin = self.origin()
+        first = bisect.bisect_right(self.rights, self.view.left - origin)
+        last = bisect.bisect_left(self.lefts, self.view.right - origin)
+        visible = {part: None for part in self.parts[first:last] if part is not self.held}
+
+        for part in [part for part in self.shown if part not in visible]:
+            del self.shown[part]
+            self.index.remove(part)
+            self.group.remove(part)
+
+        bottom = self.view.bottom - self.margin
+        for i, part in enumerate(self.parts[first:last], first):
+            if part is self.held:
+                continue
+            bottomleft = (origin + self.lefts[i], bottom)
+            if part.rect.bottomleft != bottomleft:
+                part.rect.bottomleft = bottomleft
+                part.dirty = 1
+            if part not in self.shown:
+                self.shown[part] = None
+                if part not in self.group:
+                    self.group.add(part, layer=self.layer)
+                    part.dirty = 1
+            self.index.move(part, part.rect)
+
+    def part_at(self, pos):
+        # The visible part under pos, or None
+        for part in self.index.query(pygame.Rect(pos, (1, 1))):
+            if part.rect.collidepoint(pos):
+                return part
+        return None
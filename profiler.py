@@ -0,0 +1,147 @@
+import json
+import time
+from array import array
+
+import pygame
+
+from text_cache import fonts
+
+
+class FrameProfiler:
+    # Timestamps the phases of each frame into preallocated ring buffers. Call start_frame(),
+    # then mark(phase) at the end of each phase, then end_frame(). Everything is a no-op
+    # while disabled, so it can stay wired in and be switched on at runtime.
+    def __init__(self, capacity=4096, frame_capacity=600, enabled=False):
+        self.enabled = enabled
+        self.overlay = enabled
+        self.capacity = capacity
+        self.frame_capacity = frame_capacity
+        self.phase_names = []
+        self.phase_ids = {}
+        # One entry per phase sample
+        self.starts = array('d', [0.0]) * capacity
+        self.ends = array('d', [0.0]) * capacity
+        self.phases = array('H', [0]) * capacity
+        self.frames = array('L', [0]) * capacity
+        self.count = 0
+        # One entry per frame
+        self.frame_times = array('d', [0.0]) * frame_capacity
+        self.frame_count = 0
+        self.frame_start = 0.0
+        self.last = 0.0
+        self.overlay_surface = None
+        self.overlay_frame = -1
+        self.watched = []  # (name, function returning a dict of counters) shown on the overlay
+
+    def watch(self, name, stats):
+        # Adds a line of counters to the overlay, e.g. a FixedStep's or a cache's stats()
+        self.watched.append((name, stats))
+
+    def toggle(self):
+        self.enabled = self.overlay = not self.enabled
+        # Nothing timed while disabled counts towards a phase or a frame, and the overlay is
+        # rebuilt from the new samples rather than showing what it had when switched off
+        self.frame_start = 0.0
+        self.last = time.perf_counter()
+        self.overlay_surface = None
+
+    def start_frame(self):
+        if self.enabled:
+            self.frame_start = self.last = time.perf_counter()
+
+    def mark(self, phase):
+        # Records the time since the previous mark (or the frame start) as phase
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        phase_id = self.phase_ids.get(phase)
+        if phase_id is None:
+            phase_id = self.phase_ids[phase] = len(self.phase_names)
+            self.phase_names.append(phase)
+        i = self.count % self.capacity
+        self.starts[i] = self.last
+        self.ends[i] = now
+        self.phases[i] = phase_id
+        self.frames[i] = self.frame_count
+        self.count += 1
+        self.last = now
+
+    def end_frame(self):
+        if self.enabled and self.frame_start:
+            self.frame_times[self.frame_count % self.frame_capacity] = time.perf_counter() - self.frame_start
+            self.frame_count += 1
+
+    def next_frame(self):
+        # For loops like pgzero's where the end of one frame is the start of the next
+        self.end_frame()
+        self.start_frame()
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99)):
+        # Frame time percentiles in milliseconds over the last frame_capacity frames
+        n = min(self.frame_count, self.frame_capacity)
+        if not n:
+            return [0.0 for _ in quantiles]
+        times = sorted(self.frame_times[:n])
+        return [times[min(n - 1, int(q * n))] * 1000 for q in quantiles]
+
+    def last_frame_phases(self):
+        # {phase: milliseconds} for the most recent complete frame
+        frame = self.frame_count - 1
+        phases = {}
+        for k in range(min(self.count, self.capacity)):
+            i = (self.count - 1 - k) % self.capacity
+            if self.frames[i] > frame:
+                continue
+            if self.frames[i] < frame:
+                break
+            name = self.phase_names[self.phases[i]]
+            phases[name] = phases.get(name, 0.0) + (self.ends[i] - self.starts[i]) * 1000
+        return dict(reversed(phases.items()))
+
+    def draw_overlay(self, surface, pos=(5, 5), refresh_frames=30):
+        # Draws the overlay and returns the rect it covered
+        image = self.overlay_image(refresh_frames)
+        if image is None:
+            return None
+        return surface.blit(image, pos)
+
+    def overlay_image(self, refresh_frames=30):
+        # The overlay as a surface, or None while it's hidden; the text only changes every refresh_frames
+        if not self.overlay:
+            return None
+        if self.overlay_surface is None or self.frame_count - self.overlay_frame >= refresh_frames:
+            p50, p95, p99 = self.percentiles()
+            lines = [f'frame p50 {p50:.1f}  p95 {p95:.1f}  p99 {p99:.1f} ms']
+            lines += [f'{name} {ms:.2f} ms' for name, ms in self.last_frame_phases().items()]
+            lines += [f'{name} ' + '  '.join(f'{key} {value:.2f}' if isinstance(value, float) else f'{key} {value}'
+                                             for key, value in stats().items())
+                      for name, stats in self.watched]
+            # Rendered straight from the font; these strings change too often to be worth caching
+            rendered = [fonts.get(20).render(line, True, (255, 255, 255)) for line in lines]
+            width = max(text.get_width() for text in rendered) + 8
+            height = sum(text.get_height() for text in rendered) + 8
+            self.overlay_surface = pygame.Surface((width, height))
+            y = 4
+            for text in rendered:
+                self.overlay_surface.blit(text, (4, y))
+                y += text.get_height()
+            self.overlay_frame = self.frame_count
+        return self.overlay_surface
+
+    def dump_chrome_trace(self, path):
+        # Writes the buffered samples as Chrome trace-event JSON (chrome://tracing, Perfetto)
+        events = []
+        for k in range(min(self.count, self.capacity)):
+            i = (self.count - min(self.count, self.capacity) + k) % self.capacity
+            events.append({
+                'name': self.phase_names[self.phases[i]],
+                'ph': 'X',
+                'ts': self.starts[i] * 1e6,
+                'dur': (self.ends[i] - self.starts[i]) * 1e6,
+                'pid': 1,
+                'tid': 1,
+                'args': {'frame': self.frames[i]},
+            })
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
@@ -1,5 +1,20 @@
 import pgzrun
-from random import choice
+import pygame
+from pgzero import ptext
+from pgzero.screen import Screen
+
+from entity_store import HIDDEN, EntityStore
+from flow_field import FlowField
+from gameloop import FixedStep, lerp, wait_for_queued_input
+from levels import open_levels
+from maze_grid import MazeGrid
+from maze_layer import Camera, MazeLayer
+from maze_rules import (CLOUD_SPEED, MALWARE_COUNT, MALWARE_SPEED, MAZE, RESOURCE_TYPES, SPRITES, START_CELL,
+                        STEP_RATE, VM_REQUIREMENTS, chase, contact_tables, malware_cells, move_cloud, resolve_contacts,
+                        respawn_cells, spawn_cells)
+from profiler import FrameProfiler
+from spatial_hash import SpatialHash
+from vm_board import Inventory, ResourceTypes, VMBoard
 
 # Set up the game window
 WIDTH, HEIGHT = 800, 600
@@ -7,47 +22,107 @@ WIDTH, HEIGHT = 800, 600
 # Game state
 game_state = 'start'
 
+# Logic runs at a fixed rate; pgzero's frame time is fed into it from update(dt)
+# Speeds, hitboxes and the level setup live in maze_rules.py
+loop = FixedStep(STEP_RATE)
+
+# On static screens update() blocks for input this long instead of running at 60 FPS; 0 disables it
+IDLE_TIMEOUT_MS = 250
+cached_screens = {}  # game_state -> Surface with that screen already drawn
+
+# F3 toggles the frame profiler overlay, F4 writes its buffer to TRACE_FILE
+profiler = FrameProfiler()
+profiler.watch('loop', loop.stats)
+TRACE_FILE = 'frame_trace.json'
+
 # Start button dimensions
 button_width, button_height = 200, 50
 button_x = WIDTH // 2 - button_width // 2
 button_y = HEIGHT * 3 // 4 - button_height // 2
 
+# Levels come from levels.bin, easiest first, once it's been built with `python levels.py`.
+# Without it the game plays the built-in maze layout (0 = wall, 1 = path) from maze_rules.py.
+levels = open_levels()
+level_number = 0
+level_spawns = None  # The current level's pre-validated spawn cells
+
+# Which offsets between the cloud and each other sprite are a contact, from the sprites' masks
+contacts = contact_tables(lambda kind: images.load(SPRITES[kind]))
+
+def load_level(number):
+    global grid, level_spawns, far_cells
+    if levels:
+        level = levels.load(number % len(levels))
+        grid, level_spawns = MazeGrid(level['cells']), level['spawns']
+    else:
+        grid, level_spawns = MazeGrid(MAZE), None
+    far_cells = respawn_cells(grid, contacts['malware'].reach)  # Where malware may spawn and reappear after a hit
+
+load_level(level_number)
+
+# The walls are pre-rendered in chunks; call maze_layer.set_maze() if the maze changes.
+# The camera follows the cloud once the maze is bigger than the window.
+maze_layer = MazeLayer(grid.cells)
+camera = Camera((WIDTH, HEIGHT), grid.world_size)
+
 # Define the cloud character
-cloud = Actor('cloud', (50, 50))  # Start position
-
-# Maze layout (0 = wall, 1 = path)
-maze = [
-    [0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0],
-    [1,1,1,1,1,1,0,1,1,1,1,1,1,1,1,0],
-    [0,0,0,0,0,1,0,1,0,0,0,0,0,0,1,0],
-    [0,1,1,1,0,1,1,1,0,1,1,1,1,0,1,0],
-    [0,1,0,1,0,0,0,1,0,1,0,0,1,0,1,0],
-    [0,1,0,1,1,1,1,1,1,1,0,1,1,0,1,0],
-    [0,1,0,0,0,0,0,0,0,0,0,1,0,0,1,0],
-    [0,1,1,1,1,1,1,1,1,1,1,1,0,1,1,0],
-    [0,0,0,0,0,0,0,0,0,0,0,1,0,1,0,0],
-    [0,1,1,1,1,1,1,1,1,1,1,1,1,1,1,0],
-    [0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0]
-]
-
-# Function to get valid positions in the maze
-def get_valid_positions():
-    return [(col * 50, row * 50) for row in range(len(maze)) for col in range(len(maze[0])) if maze[row][col] == 1]
-
-# Create Actor objects for resources, VMs, and malware
-valid_positions = get_valid_positions()
-resource_nodes = [
-    {'actor': Actor('cpu', choice(valid_positions)), 'type': 'cpu', 'collected': False},
-    {'actor': Actor('ram', choice(valid_positions)), 'type': 'memory', 'collected': False},
-    {'actor': Actor('storage.png', choice(valid_positions)), 'type': 'storage', 'collected': False}
-]
-
-vms = [
-    {'actor': Actor('vm', choice(valid_positions)), 'name': 'VM1', 'resource_requirement': ['cpu', 'memory'], 'resources': []},
-    {'actor': Actor('vm', choice(valid_positions)), 'name': 'VM2', 'resource_requirement': ['storage', 'cpu'], 'resources': []}
-]
-
-malware = [Actor('malware', choice(valid_positions)), Actor('malware', choice(valid_positions))]
+cloud = Actor(SPRITES['cloud'], grid.cell_center(START_CELL))
+prev_cloud_pos = cloud.pos  # Where the cloud was one logic step ago, for interpolation
+
+# Resources, VMs and malware live in one entity store (an array per field, a row per entity)
+# and are drawn a sprite type at a time. resource_nodes, vms and malware hold Actor-like views
+# of their rows; scatter_actors() places them. A placed resource sits on its VM with its label
+# below the VM's, and is still drawn there if it's picked up again.
+PLACED_LABEL_SPACING = 30
+entities = EntityStore(ptext.getsurf)
+# VMs first, so resources placed on a VM are drawn over it
+for kind in ('vm',) + RESOURCE_TYPES + ('malware',):
+    entities.add_kind(kind, images.load(SPRITES[kind]))
+
+resource_nodes = [entities.add(kind, label=kind) for kind in RESOURCE_TYPES]
+vms = [entities.add('vm', label=f'VM{i + 1}') for i in range(len(VM_REQUIREMENTS))]
+malware = [entities.add('malware', label='Malware') for _ in range(MALWARE_COUNT)]
+
+# Resource types are bit flags; the board tracks what every VM still needs and how many are unsolved
+resource_types = ResourceTypes()
+resource_bits = {resource: resource_types.bit(resource.kind) for resource in resource_nodes}
+board = VMBoard(resource_types)
+for vm, requirement in zip(vms, VM_REQUIREMENTS):
+    board.add(vm, requirement)
+carried = Inventory()  # Collected resources that haven't been placed on a VM yet
+
+# Distances to the cloud's cell; every malware just walks downhill on it
+flow = FlowField(grid)
+
+def scatter_actors():
+    # Every resource, VM and malware gets its own open cell that the cloud can reach, with the
+    # malware out of reach of the start (a level file's spawns were checked when it was built)
+    placed = resource_nodes + vms + malware
+    if level_spawns and len(level_spawns) == len(placed):
+        cells = level_spawns
+    else:
+        cells = spawn_cells(grid, len(resource_nodes + vms))
+        cells += malware_cells(grid, far_cells, cells, len(malware))
+    for entity, cell in zip(placed, cells):
+        entity.teleport(grid.cell_center(cell))
+
+scatter_actors()
+
+# Resources, VMs and malware filed by maze cell, so collision checks only look near the cloud.
+# Anything that moves one of these entities must call actors.move(entity, entity) afterwards.
+actors = SpatialHash(50)
+
+def index_actors():
+    actors.clear()
+    for entity in resource_nodes + vms + malware:
+        actors.insert(entity, entity)
+
+def touching(actor):
+    # Pixel-accurate contacts between the cloud and the indexed entities around it, in entity order
+    return sorted((other for other in actors.query(actor)
+                   if contacts[other.kind].touching(other.x - actor.x, other.y - actor.y)), key=lambda other: other.id)
+
+index_actors()
 
 # Add this near the top of your file, with other global variables
 all_vms_solved_message_printed = False
@@ -58,119 +133,157 @@ def on_mouse_down(pos):
         if button_x <= pos[0] <= button_x + button_width and button_y <= pos[1] <= button_y + button_height:
             game_state = 'prologue'  # Change to prologue state
 
-def update():
-    global resource_nodes, vms, all_vms_solved_message_printed, game_state
+def update(dt):
+    # pgzero flips, ticks and dispatches events between draw() and the next update()
+    profiler.mark('pgzero')
+    profiler.next_frame()
+    if game_state in STATIC_SCREENS and IDLE_TIMEOUT_MS:
+        # Nothing moves here, so sleep until input arrives. pgzero's clock counts the wait into
+        # the next dt, but it isn't game time.
+        started = pygame.time.get_ticks()
+        wait_for_queued_input(IDLE_TIMEOUT_MS)
+        loop.exclude((pygame.time.get_ticks() - started) / 1000)
+    else:
+        loop.advance(dt, step)
+    profiler.mark('update')
+
+def step(dt):
+    global all_vms_solved_message_printed, game_state, prev_cloud_pos
+    prev_cloud_pos = cloud.pos
+    entities.snapshot()
     if game_state == 'playing':
-        # Move the cloud character
-        new_x, new_y = cloud.x, cloud.y
-        if keyboard.left:
-            new_x -= 5
-        if keyboard.right:
-            new_x += 5
-        if keyboard.up:
-            new_y -= 5
-        if keyboard.down:
-            new_y += 5
-
-        # Check if the new position is valid (not a wall)
-        grid_x, grid_y = int(new_x // 50), int(new_y // 50)
-        if 0 <= grid_y < len(maze) and 0 <= grid_x < len(maze[0]) and maze[grid_y][grid_x] == 1:
-            cloud.x, cloud.y = new_x, new_y
-
-        # Check for resource collection
-        for resource in resource_nodes:
-            if cloud.colliderect(resource['actor']) and not resource['collected']:
-                resource['collected'] = True
-                print(f"Collected {resource['type']}")
-
-        # Check for VM puzzle-solving
-        for vm in vms:
-            if cloud.colliderect(vm['actor']):
-                for resource in resource_nodes:
-                    if resource['collected'] and resource['type'] in vm['resource_requirement'] and resource['type'] not in [r['type'] for r in vm['resources']]:
-                        vm['resources'].append(resource)
-                        resource['collected'] = False
-                        resource['actor'].pos = vm['actor'].pos
-                        print(f"Placed {resource['type']} on {vm['name']}")
+        # Move the cloud character, sliding along the walls
+        direction = (keyboard.right - keyboard.left, keyboard.down - keyboard.up)
+        cloud.pos = move_cloud(grid, cloud.pos, direction, CLOUD_SPEED * dt)
 
-        # Check if all VMs are solved
-        all_vms_solved = all(set(vm['resource_requirement']) == set(r['type'] for r in vm['resources']) for vm in vms)
+        # Malware chases the cloud; the field is only rebuilt when the cloud enters a new cell
+        flow.update(grid.cell_at(cloud.pos))
+        for enemy in malware:
+            enemy.pos = chase(grid, flow, enemy.pos, MALWARE_SPEED * dt)
+            actors.move(enemy, enemy)
+
+        # Pick up, place and get hit by whatever is touching the cloud, by the rules in maze_rules.py
+        touched = touching(cloud)
+        collected, placed, hit = resolve_contacts(
+            board, carried, resource_bits,
+            [entity for entity in touched if entity in resource_bits],
+            [entity for entity in touched if entity.kind == 'vm'],
+            [entity for entity in touched if entity.kind == 'malware'])
+        for resource in collected:
+            # One picked up off a VM is still drawn there
+            resource.set_flag(HIDDEN, resource.owner is None)
+            print(f"Collected {resource.kind}")
+        for resource, vm, slot in placed:
+            resource.set_flag(HIDDEN, False)
+            resource.owner = vm
+            resource.teleport(vm.pos)
+            resource.label_offset = (0, PLACED_LABEL_SPACING * (slot + 1))
+            actors.move(resource, resource)
+            print(f"Placed {resource.kind} on {vm.label}")
+        if hit is not None:
+            hit_by_malware(hit)
 
-        if all_vms_solved and not all_vms_solved_message_printed:
+        # Check if all VMs are solved
+        if board.solved and not all_vms_solved_message_printed:
             print("Good job! All VMs are correctly configured.")
             all_vms_solved_message_printed = True
             game_state = 'completed'  # Change game state to 'completed'
 
+def hit_by_malware(enemy):
+    # The cloud is sent back to the start and the malware jumps to a free cell well away from it
+    global prev_cloud_pos
+    print("Hit by malware! Back to the start.")
+    cloud.pos = grid.cell_center(START_CELL)
+    prev_cloud_pos = cloud.pos
+    occupied = [grid.cell_at(entity.pos) for entity in resource_nodes + vms + malware]
+    cell, = malware_cells(grid, far_cells, occupied, 1)
+    enemy.teleport(grid.cell_center(cell))
+    actors.move(enemy, enemy)
+
 def draw():
-    screen.clear()
-    if game_state == 'start':
-        screen.draw.text("Welcome to Cloud Resource Manager", center=(WIDTH/2, HEIGHT/4), fontsize=40, color="white")
-        screen.draw.text("Navigate the maze, collect resources, and configure VMs!", center=(WIDTH/2, HEIGHT/2), fontsize=30, color="white")
-        
-        # Draw start button
-        screen.draw.filled_rect(Rect((button_x, button_y), (button_width, button_height)), color="light blue")
-        screen.draw.rect(Rect((button_x, button_y), (button_width, button_height)), color="navy")
-        screen.draw.text("Start", center=(WIDTH/2, button_y + button_height/2), fontsize=30, color="navy")
-    
-    elif game_state == 'prologue':
-        screen.draw.text("Introduction to Cloud Computing", center=(WIDTH/2, HEIGHT/6), fontsize=40, color="white")
-        prologue_text = [
-            "Cloud computing is like renting a powerful computer over the internet.",
-            "Instead of owning physical hardware, you can use virtual resources",
-            "such as processing power, memory, and storage.",
-            "",
-            "In this game, you'll manage cloud resources:",
-            "- Collect CPU, RAM, and Storage",
-            "- Configure Virtual Machines (VMs) with these resources",
-            "- So that they can run your applications smoothly",
-            "- And users can access them from anywhere in the world",
-            "- Avoid malware that can harm your cloud infrastructure",
-            "",
-            "Press SPACE to continue to instructions"
-        ]
-        for i, line in enumerate(prologue_text):
-            screen.draw.text(line, center=(WIDTH/2, HEIGHT/3 + i*30), fontsize=20, color="white")
-    
-    elif game_state == 'instructions':
-        screen.draw.text("Instructions", center=(WIDTH/2, HEIGHT/4), fontsize=40, color="white")
-        screen.draw.text("1. Use arrow keys to move the cloud.", center=(WIDTH/2, HEIGHT/2 - 30), fontsize=30, color="white")
-        screen.draw.text("2. Collect resources and configure VMs.", center=(WIDTH/2, HEIGHT/2), fontsize=30, color="white")
-        screen.draw.text("3. Avoid malware.", center=(WIDTH/2, HEIGHT/2 + 30), fontsize=30, color="white")
-        screen.draw.text("Press SPACE to start playing", center=(WIDTH/2, HEIGHT*3/4), fontsize=30, color="white")
-    
+    if game_state in STATIC_SCREENS:
+        # Menus and story screens never change, so each one is drawn once and reused
+        screen.blit(static_screen(game_state), (0, 0))
     elif game_state == 'playing':
-        # Draw the maze
-        for y, row in enumerate(maze):
-            for x, cell in enumerate(row):
-                if cell == 0:
-                    screen.draw.filled_rect(Rect((x*50, y*50), (50, 50)), color="gray")
+        screen.clear()
+        # Moving actors are drawn between their last two logic steps; the camera keeps the cloud in view
+        cloud_pos = interpolate(cloud, prev_cloud_pos)
+        camera.follow(cloud_pos)
+        maze_layer.draw(screen.surface, camera)
 
         # Draw the game elements
-        cloud.draw()
-        for resource in resource_nodes:
-            if not resource['collected']:
-                resource['actor'].draw()
-                screen.draw.text(resource['type'], resource['actor'].pos)
-        for vm in vms:
-            vm['actor'].draw()
-            screen.draw.text(vm['name'], vm['actor'].pos)
-            for i, resource in enumerate(vm['resources']):
-                resource['actor'].draw()
-                screen.draw.text(resource['type'], (vm['actor'].x, vm['actor'].y + 30 + i * 30))
-        for enemy in malware:
-            enemy.draw()
-            screen.draw.text("Malware", enemy.pos)
+        draw_actor(cloud, cloud_pos)
+        entities.draw(screen.surface, camera.to_screen((0, 0)), loop.alpha)
+
+    profiler.mark('draw')
+    profiler.draw_overlay(screen.surface)
+
+# The cloud lives in maze coordinates, so it's drawn through the camera
+def draw_actor(actor, pos=None):
+    # pos overrides where the actor's anchor is drawn, e.g. with an interpolated position
+    left, top = actor.topleft
+    if pos is not None:
+        left, top = left + pos[0] - actor.x, top + pos[1] - actor.y
+    screen.blit(actor.image, camera.to_screen((left, top)))
+
+def interpolate(actor, prev_pos):
+    return (lerp(prev_pos[0], actor.x, loop.alpha), lerp(prev_pos[1], actor.y, loop.alpha))
+
+def static_screen(state):
+    surface = cached_screens.get(state)
+    if surface is None:
+        surface = cached_screens[state] = pygame.Surface((WIDTH, HEIGHT))
+        STATIC_SCREENS[state](Screen(surface))
+    return surface
+
+def draw_start_screen(target):
+    target.draw.text("Welcome to Cloud Resource Manager", center=(WIDTH/2, HEIGHT/4), fontsize=40, color="white")
+    target.draw.text("Navigate the maze, collect resources, and configure VMs!", center=(WIDTH/2, HEIGHT/2), fontsize=30, color="white")
+
+    # Draw start button
+    target.draw.filled_rect(Rect((button_x, button_y), (button_width, button_height)), color="light blue")
+    target.draw.rect(Rect((button_x, button_y), (button_width, button_height)), color="navy")
+    target.draw.text("Start", center=(WIDTH/2, button_y + button_height/2), fontsize=30, color="navy")
+
+def draw_prologue(target):
+    target.draw.text("Introduction to Cloud Computing", center=(WIDTH/2, HEIGHT/6), fontsize=40, color="white")
+    prologue_text = [
+        "Cloud computing is like renting a powerful computer over the internet.",
+        "Instead of owning physical hardware, you can use virtual resources",
+        "such as processing power, memory, and storage.",
+        "",
+        "In this game, you'll manage cloud resources:",
+        "- Collect CPU, RAM, and Storage",
+        "- Configure Virtual Machines (VMs) with these resources",
+        "- So that they can run your applications smoothly",
+        "- And users can access them from anywhere in the world",
+        "- Avoid malware that can harm your cloud infrastructure",
+        "",
+        "Press SPACE to continue to instructions"
+    ]
+    for i, line in enumerate(prologue_text):
+        target.draw.text(line, center=(WIDTH/2, HEIGHT/3 + i*30), fontsize=20, color="white")
+
+def draw_instructions(target):
+    target.draw.text("Instructions", center=(WIDTH/2, HEIGHT/4), fontsize=40, color="white")
+    target.draw.text("1. Use arrow keys to move the cloud.", center=(WIDTH/2, HEIGHT/2 - 30), fontsize=30, color="white")
+    target.draw.text("2. Collect resources and configure VMs.", center=(WIDTH/2, HEIGHT/2), fontsize=30, color="white")
+    target.draw.text("3. Avoid malware.", center=(WIDTH/2, HEIGHT/2 + 30), fontsize=30, color="white")
+    target.draw.text("Press SPACE to start playing", center=(WIDTH/2, HEIGHT*3/4), fontsize=30, color="white")
+
+def draw_completed(target):
+    target.fill("black")
+    target.draw.text("Congratulations!", center=(WIDTH/2, HEIGHT/3), fontsize=60, color="white")
+    target.draw.text("You've completed the game!", center=(WIDTH/2, HEIGHT/2), fontsize=40, color="white")
+    target.draw.text("Press SPACE to view credits", center=(WIDTH/2, HEIGHT*2/3), fontsize=30, color="white")
 
-    elif game_state == 'completed':
-        screen.fill("black")
-        screen.draw.text("Congratulations!", center=(WIDTH/2, HEIGHT/3), fontsize=60, color="white")
-        screen.draw.text("You've completed the game!", center=(WIDTH/2, HEIGHT/2), fontsize=40, color="white")
-        screen.draw.text("Press SPACE to view credits", center=(WIDTH/2, HEIGHT*2/3), fontsize=30, color="white")
-    elif game_state == 'credits':
-        draw_credits()
 
 def on_key_down(key):
     global game_state
+    if key == keys.F3:
+        profiler.toggle()
+    elif key == keys.F4:
+        print(f"Wrote {profiler.dump_chrome_trace(TRACE_FILE)} trace events to {TRACE_FILE}")
     if game_state == 'prologue' and key == keys.SPACE:
         game_state = 'instructions'
     elif game_state == 'instructions' and key == keys.SPACE:
@@ -181,32 +294,39 @@ def on_key_down(key):
         reset_game()
         game_state = 'start'
 
+def next_level():
+    global level_number, flow
+    level_number += 1
+    load_level(level_number)
+    maze_layer.set_maze(grid.cells)
+    camera.world_size = grid.world_size
+    flow = FlowField(grid)
+
 def reset_game():
-    global cloud, resource_nodes, vms, malware, all_vms_solved_message_printed
+    global all_vms_solved_message_printed, prev_cloud_pos
     
-    # Reset cloud position
-    cloud.pos = (50, 50)
+    # Move on to the next level, if there's a level file
+    if levels:
+        next_level()
     
-    # Reset resources
-    valid_positions = get_valid_positions()
-    for resource in resource_nodes:
-        resource['actor'].pos = choice(valid_positions)
-        resource['collected'] = False
+    # Reset cloud position
+    cloud.pos = grid.cell_center(START_CELL)
+    prev_cloud_pos = cloud.pos
     
-    # Reset VMs
-    for vm in vms:
-        vm['actor'].pos = choice(valid_positions)
-        vm['resources'] = []
+    # Reset resources and VMs
+    entities.reset()
+    board.reset()
+    carried.clear()
     
-    # Reset malware positions
-    for m in malware:
-        m.pos = choice(valid_positions)
+    # Reset resource, VM and malware positions
+    scatter_actors()
+    index_actors()
     
     # Reset completion flag
     all_vms_solved_message_printed = False
 
-def draw_credits():
-    screen.fill("black")
+def draw_credits(target):
+    target.fill("black")
     credits = [
         "Cloud Resource Manager",
         "",
@@ -225,6 +345,15 @@ def draw_credits():
         "Press SPACE to restart"
     ]
     for i, line in enumerate(credits):
-        screen.draw.text(line, center=(WIDTH/2, 50 + i * 30), fontsize=30, color="white")
+        target.draw.text(line, center=(WIDTH/2, 50 + i * 30), fontsize=30, color="white")
+
+# Screens with no moving parts; update() sleeps on these until there's input
+STATIC_SCREENS = {
+    'start': draw_start_screen,
+    'prologue': draw_prologue,
+    'instructions': draw_instructions,
+    'completed': draw_completed,
+    'credits': draw_credits,
+}
 
 pgzrun.go()
@@ -1,74 +1,191 @@
 import pygame
 import random
+import sys
+
+from asset_cache import bake, load_image
+from gameloop import GameLoop, lerp
+from input_pipeline import InputPipeline
+from parts_tray import PartTray
+from profiler import FrameProfiler
+from render_backend import RENDERER_MODES, create_renderer
+from spatial_hash import SpatialHash
+from sprite_batch import BatchedLayeredDirty, ScaledSpriteCache
+from surface_cache import SurfaceCache
+from text_cache import render_text, text_cache
 
 # Initialize Pygame
 pygame.init()
 
 # Constants
 WIDTH, HEIGHT = 800, 600
-FPS = 60
+FPS = 60  # Render rate; can be lowered on weak hardware without changing game speed
+UPDATE_RATE = 60  # Fixed logic steps per second
+IDLE_TIMEOUT_MS = 250  # While nothing is animating, block on input this long instead of running at FPS
+TRACE_FILE = 'frame_trace.json'  # F4 writes the profiler's buffer here; F3 toggles the profiler
+DIRTY_RECTS = True  # Only present the regions that changed; False redraws the full screen every frame
+TRAY_SCROLL_STEP = 40  # Pixels the parts tray scrolls per mouse wheel notch
+RENDERER = 'surface'  # 'gpu' or 'software' composes frames from textures (see render_backend.py); --renderer=MODE overrides
+
+# Draw order of the sprite layers
+SHELL_LAYER, ASSEMBLY_LAYER, SLOT_LAYER, PART_LAYER, DRAG_LAYER, MENU_LAYER = range(6)
 
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 
-# Load images
-PARTS = {
-    'CPU': pygame.image.load('cpu.png'),
-    'RAM': pygame.image.load('ram.png'),
-    'GPU': pygame.image.load('gpu.png'),
+# Image files
+PART_FILES = {
+    'CPU': 'cpu.png',
+    'RAM': 'ram.png',
+    'GPU': 'gpu.png',
 }
-BACKGROUND = pygame.image.load('background.png')
-PC_SHELL = [pygame.image.load(f'PC_shell_({i}).png') for i in range(1,4)]
+BACKGROUND_FILE = 'background.png'
+PC_SHELL_FILES = [f'PC_shell_({i}).png' for i in range(1,4)]
+PART_SCALE = 0.5  # Adjust this value to make pieces larger or smaller
+SHELL_CACHE_BYTES = 12 * 1024 * 1024  # Roughly three decoded shells; older ones are evicted
+
+# Filled in by load_assets() once the display exists, so it matches its pixel format
+BACKGROUND = None
+
+def load_assets():
+    global BACKGROUND
+    BACKGROUND = load_image(BACKGROUND_FILE, alpha=False)
+
+def load_part(name, scale):
+    return load_image(PART_FILES[name], scale)
+
+def load_shell(index):
+    # PC shells are big, so they are loaded on demand through the Game's SurfaceCache
+    return load_image(PC_SHELL_FILES[index], alpha=False)
+
+def bake_assets():
+    # Pre-bakes every image the game loads, e.g. when building a kiosk image
+    for path in PART_FILES.values():
+        bake(path, PART_SCALE)
+    bake(BACKGROUND_FILE, alpha=False)
+    for path in PC_SHELL_FILES:
+        bake(path, alpha=False)
 
 # Classes
-class Part:
-    def __init__(self, name, image):
+class Part(pygame.sprite.DirtySprite):
+    def __init__(self, name, image, source_rect=None):
+        super().__init__()
         self.name = name
         self.image = image
-        self.rect = self.image.get_rect()
+        self.source_rect = source_rect  # Region of image to draw when image is an atlas
+        self.rect = pygame.Rect((0, 0), source_rect.size) if source_rect else self.image.get_rect()
         self.draggable = False
 
+class StaticSprite(pygame.sprite.DirtySprite):
+    # A sprite that only gets redrawn when it moves or something under it changes
+    def __init__(self, image, rect):
+        super().__init__()
+        self.image = image
+        self.rect = rect
+
+class Slot(pygame.sprite.DirtySprite):
+    # Empty slot outline with its label, positioned relative to the PC shell
+    def __init__(self, name, rect, image, source_rect):
+        super().__init__()
+        self.name = name
+        self.image = image
+        self.source_rect = source_rect
+        self.rect = rect.copy()
+
+def render_slot(name, size):
+    image = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.rect(image, (255, 255, 0), image.get_rect(), 3)
+    text_surface = render_text(name, 24, (255, 255, 0))
+    image.blit(text_surface, text_surface.get_rect(center=image.get_rect().center))
+    return image
+
 class Order:
     def __init__(self):
-        self.parts = random.sample(list(PARTS.keys()), k=3)  # Random order of 3 parts
+        self.parts = random.sample(list(PART_FILES.keys()), k=3)  # Random order of 3 parts
 
-class Button:
+class Button(pygame.sprite.DirtySprite):
     def __init__(self, x, y, width, height, text, color, text_color):
+        super().__init__()
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
         self.color = color
         self.text_color = text_color
+        self.image = self.render()
+
+    def render(self):
+        image = pygame.Surface(self.rect.size)
+        image.fill(self.color)
+        text_surface = render_text(self.text, 36, self.text_color)
+        text_rect = text_surface.get_rect(center=image.get_rect().center)
+        image.blit(text_surface, text_rect)
+        return image
 
     def draw(self, screen):
-        pygame.draw.rect(screen, self.color, self.rect)
-        font = pygame.font.Font(None, 36)
-        text_surface = font.render(self.text, True, self.text_color)
-        text_rect = text_surface.get_rect(center=self.rect.center)
-        screen.blit(text_surface, text_rect)
+        screen.blit(self.image, self.rect)
 
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
-        pygame.display.set_caption('Computer Builder')
-        self.clock = pygame.time.Clock()
-        scale_factor = 0.5  # Adjust this value to make pieces larger or smaller
-        self.parts = [Part(name, pygame.transform.scale(image, 
-                           (int(image.get_width() * scale_factor), 
-                            int(image.get_height() * scale_factor))))
-                      for name, image in PARTS.items()]
+    def __init__(self, renderer=RENDERER):
+        # With a texture renderer there's no display surface to draw on; frames are composed from textures
+        self.renderer = create_renderer(renderer, 'Computer Builder', (WIDTH, HEIGHT))
+        if self.renderer is None:
+            self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+            pygame.display.set_caption('Computer Builder')
+        else:
+            self.screen = None
+        self.loop = GameLoop(UPDATE_RATE, FPS)
+        self.profiler = FrameProfiler()
+        load_assets()
+        self.sprite_cache = ScaledSpriteCache(load_part)
         self.assembly_area = pygame.Rect(0, HEIGHT - 150, WIDTH, 150)
         self.current_order = Order()
         self.dragging_part = None
         self.dragging_offset = (0, 0)
-        self.pc_shell_rect = PC_SHELL[0].get_rect(center=(WIDTH // 2, HEIGHT // 2))
+        self.shells = SurfaceCache(load_shell, SHELL_CACHE_BYTES)
+        self.profiler.watch('loop', self.loop.stats)
+        self.profiler.watch('shells', self.shells.stats)
+        self.profiler.watch('text', text_cache.stats)
+        self.shell_image = self.shells.get(0)
+        self.shells.prefetch(1)
+        self.pc_shell_rect = self.shell_image.get_rect(center=(WIDTH // 2, HEIGHT // 2))
+        self.prev_shell_x = self.pc_shell_rect.x  # Where the shell was one logic step ago, for interpolation
         self.pc_slots = self.create_pc_slots()
+        self.atlas = self.build_atlas(PART_SCALE)
         self.assembled_parts = {}
         self.current_shell = 0
-        self.total_shells = len(PC_SHELL)
+        self.total_shells = len(PC_SHELL_FILES)
         self.game_state = "START"
         self.start_button = Button(WIDTH//2 - 50, HEIGHT//2 - 25, 100, 50, "Start", (0, 255, 0), WHITE)
-        self.slide_speed = 50
+        self.slide_speed = 3000  # Pixels per second
+
+        # Everything on screen is a sprite so only the regions that changed get redrawn
+        self.title = StaticSprite(*self.render_title())
+        self.shell_sprite = StaticSprite(self.shell_image, self.pc_shell_rect)
+        self.assembly_sprite = StaticSprite(pygame.Surface(self.assembly_area.size), self.assembly_area)
+        self.slot_sprites = {part_name: Slot(part_name, slot, self.atlas.surface, self.atlas[f'slot:{part_name}'])
+                             for part_name, slot in self.pc_slots.items()}
+        self.sprites = BatchedLayeredDirty()
+        self.sprites.clear(self.screen, BACKGROUND)
+        self.sprites.add(self.title, self.start_button, layer=MENU_LAYER)
+        self.tray = PartTray(self.assembly_area, self.sprites, PART_LAYER)
+        self.tray.set_parts(self.create_parts())
+        # Absolute slot rects for drop hit-tests, rebuilt when the shell has moved since the last drop
+        self.slot_index = SpatialHash(cell_size=60)
+        self.slot_rects = {}
+        self.slot_index_at = None
+        self.full_redraw = True
+
+        # One input path for the whole game: {state: {event type: handler}}
+        self.input = InputPipeline({
+            None: {pygame.WINDOWEXPOSED: self.handle_expose, pygame.KEYDOWN: self.handle_key},
+            "START": {pygame.MOUSEBUTTONDOWN: self.handle_start_click},
+            "PLAYING": {
+                pygame.MOUSEBUTTONDOWN: lambda event: self.start_dragging(event.pos),
+                pygame.MOUSEBUTTONUP: lambda event: self.stop_dragging(event.pos),
+                pygame.MOUSEMOTION: lambda event: self.drag_part(event.pos),
+                pygame.MOUSEWHEEL: lambda event: self.tray.scroll_by((event.x - event.y) * TRAY_SCROLL_STEP),
+            },
+        }, lambda: self.game_state, [pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION,
+                                     pygame.MOUSEWHEEL, pygame.WINDOWEXPOSED, pygame.KEYDOWN])
 
         # Initialize the mixer
         pygame.mixer.init()
@@ -88,47 +205,51 @@ class Game:
             # Add more slots as needed
         }
 
-    def handle_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return False
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                if self.game_state == "START":
-                    if self.start_button.rect.collidepoint(event.pos):
-                        self.game_state = "PLAY"
-                else:
-                    self.start_dragging(event.pos)
-            elif event.type == pygame.MOUSEBUTTONUP:
-                self.stop_dragging(event.pos)
-            elif event.type == pygame.MOUSEMOTION:
-                self.drag_part(event.pos)
-        return True
+    def build_atlas(self, scale):
+        # Scaled part images and slot sprites share one surface, cached per scale
+        slot_images = {f'slot:{part_name}': render_slot(part_name, slot.size) for part_name, slot in self.pc_slots.items()}
+        return self.sprite_cache.atlas(list(PART_FILES), scale, slot_images)
+
+    def create_parts(self):
+        return [Part(name, self.atlas.surface, self.atlas[name]) for name in PART_FILES]
 
     def start_dragging(self, pos):
-        for part in self.parts:
-            if part.rect.collidepoint(pos):
-                self.dragging_part = part
-                self.dragging_offset = (pos[0] - part.rect.x, pos[1] - part.rect.y)
-                break
+        part = self.tray.part_at(pos)
+        if part:
+            self.dragging_part = part
+            self.dragging_offset = (pos[0] - part.rect.x, pos[1] - part.rect.y)
+            part.draggable = True
+            self.tray.hold(part)
+            self.sprites.change_layer(part, DRAG_LAYER)
+
+    def slots_at(self, pos):
+        # Names of the slots under pos
+        if self.slot_index_at != self.pc_shell_rect.topleft:
+            self.slot_index_at = self.pc_shell_rect.topleft
+            self.slot_index.clear()
+            for part_name, slot in self.pc_slots.items():
+                self.slot_rects[part_name] = slot.move(self.slot_index_at)
+                self.slot_index.insert(part_name, self.slot_rects[part_name])
+        return [part_name for part_name in self.slot_index.query(pygame.Rect(pos, (1, 1)))
+                if self.slot_rects[part_name].collidepoint(pos)]
 
     def stop_dragging(self, pos):
         if self.dragging_part:
-            snapped = False
-            for part_name, slot in self.pc_slots.items():
-                slot_rect = slot.move(self.pc_shell_rect.topleft)
-                if slot_rect.collidepoint(pos) and part_name == self.dragging_part.name and part_name not in self.assembled_parts:
+            for part_name in self.slots_at(pos):
+                if part_name == self.dragging_part.name and part_name not in self.assembled_parts:
                     # Snap the part into place
-                    self.dragging_part.rect = slot_rect.copy()
+                    self.dragging_part.rect.topleft = self.slot_rects[part_name].topleft
+                    self.slot_sprites[part_name].visible = 0
+                    self.slot_sprites[part_name].dirty = 1
                     self.assembled_parts[part_name] = self.dragging_part
-                    if self.dragging_part in self.parts:
-                        self.parts.remove(self.dragging_part)
-                    snapped = True
+                    self.tray.remove(self.dragging_part)
                     break
-            
-            if not snapped and self.dragging_part not in self.assembled_parts.values():
-                # Return the part to its original position only if it's not already assembled
-                self.parts.append(self.dragging_part)
-            
+
+            # A part that didn't snap is still in the tray, so its next layout() puts it back
+            self.tray.release()
+            self.dragging_part.draggable = False
+            self.sprites.change_layer(self.dragging_part, PART_LAYER)
+            self.dragging_part.dirty = 1
             self.dragging_part = None
 
             # Check if all parts are assembled
@@ -139,135 +260,203 @@ class Game:
         if self.dragging_part:
             self.dragging_part.rect.x = pos[0] - self.dragging_offset[0]
             self.dragging_part.rect.y = pos[1] - self.dragging_offset[1]
+            self.dragging_part.dirty = 1
 
     def run(self):
         running = True
+        profiler = self.profiler
+        idle = False
         while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                self.handle_event(event)
-
-            self.update()
-            self.draw()
-            pygame.display.flip()
-            self.clock.tick(FPS)
-
-    def handle_event(self, event):
-        if self.game_state == "START":
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if self.start_button.rect.collidepoint(event.pos):
-                    self.game_state = "SLIDING_IN"
-        elif self.game_state == "PLAYING":
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                self.handle_mouse_down(event.pos)
-            if event.type == pygame.MOUSEBUTTONUP:
-                self.handle_mouse_up()
-            if event.type == pygame.MOUSEMOTION:
-                self.handle_mouse_motion(event.pos)
-
-    def update(self):
+            profiler.start_frame()
+            woken = None
+            if idle:
+                # Nothing on screen is changing, so sleep until there's input
+                woken = self.loop.wait_for_input(IDLE_TIMEOUT_MS)
+            running = self.input.pump(woken)
+            profiler.mark('events')
+
+            # Logic runs at UPDATE_RATE while rendering is paced to FPS
+            frame_time = 0.0 if idle else self.loop.pace()
+            profiler.mark('tick')
+            alpha = self.loop.advance(frame_time, self.update)
+            profiler.mark('update')
+            if self.renderer is not None:
+                dirty_rects = self.compose(alpha)
+                profiler.mark('draw')
+                if dirty_rects:
+                    self.renderer.present()
+            else:
+                dirty_rects = self.draw(alpha)
+                profiler.mark('draw')
+
+                overlay_rect = profiler.draw_overlay(self.screen)
+                if overlay_rect:
+                    # Show the overlay now and have the sprites paint over it next frame
+                    dirty_rects.append(overlay_rect)
+                    self.sprites.repaint_rect(overlay_rect)
+
+                # Present exactly once per frame, and not at all when nothing changed
+                if not DIRTY_RECTS:
+                    pygame.display.flip()
+                elif dirty_rects:
+                    pygame.display.update(dirty_rects)
+            profiler.mark('present')
+            profiler.end_frame()
+            idle = self.is_idle(dirty_rects)
+        self.shells.close()
+        if self.renderer is not None:
+            self.renderer.close()
+
+    def handle_start_click(self, event):
+        if self.start_button.rect.collidepoint(event.pos):
+            self.start_game()
+
+    def is_idle(self, dirty_rects):
+        # The START screen and a PLAYING shell with nothing being dragged only change on input
+        return (not dirty_rects and self.dragging_part is None and not self.profiler.overlay
+                and self.game_state in ("START", "PLAYING"))
+
+    def handle_key(self, event):
+        if event.key == pygame.K_F3:
+            self.profiler.toggle()
+            self.full_redraw = True
+        elif event.key == pygame.K_F4:
+            print(f"Wrote {self.profiler.dump_chrome_trace(TRACE_FILE)} trace events to {TRACE_FILE}")
+
+    def handle_expose(self, event):
+        # The window contents were lost, so the next frame repaints everything
+        self.full_redraw = True
+
+    def start_game(self):
+        self.game_state = "SLIDING_IN"
+        self.sprites.remove(self.title, self.start_button)
+        self.sprites.add(self.shell_sprite, layer=SHELL_LAYER)
+        self.sprites.add(self.assembly_sprite, layer=ASSEMBLY_LAYER)
+        self.sprites.add(*self.slot_sprites.values(), layer=SLOT_LAYER)
+        self.place_shell()
+
+    def update(self, dt):
+        self.shells.poll()
+        self.prev_shell_x = self.pc_shell_rect.x
         if self.game_state == "SLIDING_IN":
-            self.pc_shell_rect.x += self.slide_speed
+            self.pc_shell_rect.x += round(self.slide_speed * dt)
             if self.pc_shell_rect.left >= 0:
                 self.pc_shell_rect.left = 0
                 self.game_state = "PLAYING"
         elif self.game_state == "SLIDING_OUT":
-            self.pc_shell_rect.x += self.slide_speed
+            self.pc_shell_rect.x += round(self.slide_speed * dt)
             if self.pc_shell_rect.left >= WIDTH:
                 self.game_state = "SLIDING_IN"
-                self.pc_shell_rect.right = -100
                 self.current_order = Order()
+                self.show_next_shell()
+        if self.game_state != "START":
+            self.tray.layout()
 
-    def draw(self):
-        self.screen.blit(BACKGROUND, (0, 0))
-        if self.game_state == "START":
-            # Draw title background
-            font = pygame.font.Font(None, 64)
-            title_text = "Isaias' Computer Shop"
-            title_surface = font.render(title_text, True, WHITE)
-            title_rect = title_surface.get_rect(center=(WIDTH // 2, HEIGHT // 4))
-            
-            # Create a slightly larger rect for the background
-            bg_rect = title_rect.inflate(20, 10)  # 20 pixels wider, 10 pixels taller
-            pygame.draw.rect(self.screen, BLACK, bg_rect)
-            
-            # Draw the title text
-            self.screen.blit(title_surface, title_rect)
-            
-            # Draw start button
-            self.start_button.draw(self.screen)
-        else:
-            self.screen.blit(PC_SHELL[self.current_shell], self.pc_shell_rect)
-            
-            # Draw assembly area
-            pygame.draw.rect(self.screen, BLACK, self.assembly_area)
-            
-            # Draw PC slots and assembled parts
-            for part_name, slot in self.pc_slots.items():
-                slot_rect = slot.move(self.pc_shell_rect.topleft)
-                if part_name in self.assembled_parts:
-                    # Draw the assembled part
-                    self.screen.blit(self.assembled_parts[part_name].image, slot_rect)
-                else:
-                    # Draw empty slot
-                    pygame.draw.rect(self.screen, (255, 255, 0), slot_rect, 3)
-                    font = pygame.font.Font(None, 24)
-                    text_surface = font.render(part_name, True, (255, 255, 0))
-                    text_rect = text_surface.get_rect(center=slot_rect.center)
-                    self.screen.blit(text_surface, text_rect)
-            
-            # Draw unassembled parts
-            self.draw_parts()
-
-            # Draw the dragged part last so it appears on top
-            if self.dragging_part:
-                self.screen.blit(self.dragging_part.image, self.dragging_part.rect)
+    def place_shell(self, shell_x=None):
+        # Move the shell sprite, its slots and the parts snapped into them to pc_shell_rect,
+        # or to shell_x when drawing an interpolated position
+        shell_rect = self.pc_shell_rect.copy()
+        if shell_x is not None:
+            shell_rect.x = shell_x
+        self.shell_sprite.image = self.shell_image
+        self.shell_sprite.rect = shell_rect
+        self.shell_sprite.dirty = 1
+        for part_name, slot in self.pc_slots.items():
+            slot_rect = slot.move(shell_rect.topleft)
+            slot_sprite = self.slot_sprites[part_name]
+            slot_sprite.rect = slot_rect
+            slot_sprite.visible = int(part_name not in self.assembled_parts)
+            slot_sprite.dirty = 1
+            if part_name in self.assembled_parts:
+                part = self.assembled_parts[part_name]
+                part.rect.topleft = slot_rect.topleft
+                part.dirty = 1
 
-        pygame.display.flip()
-        self.clock.tick(FPS)
+    def render_title(self):
+        title_text = "Isaias' Computer Shop"
+        title_surface = render_text(title_text, 64, WHITE)
+        title_rect = title_surface.get_rect(center=(WIDTH // 2, HEIGHT // 4))
 
-    def handle_mouse_down(self, pos):
-        for part in self.parts:
-            if part.rect.collidepoint(pos):
-                self.dragging_part = part
-                part.draggable = True
+        # Create a slightly larger rect for the background
+        bg_rect = title_rect.inflate(20, 10)  # 20 pixels wider, 10 pixels taller
+        image = pygame.Surface(bg_rect.size)
+        image.fill(BLACK)
+        image.blit(title_surface, title_surface.get_rect(center=image.get_rect().center))
+        return image, bg_rect
 
-    def handle_mouse_up(self):
-        if self.dragging_part:
-            # Check if part is dropped in valid area
-            self.dragging_part.draggable = False
-            self.dragging_part = None
+    def interpolate_shell(self, alpha):
+        if self.game_state != "START":
+            shell_x = round(lerp(self.prev_shell_x, self.pc_shell_rect.x, alpha))
+            if shell_x != self.shell_sprite.rect.x:
+                self.place_shell(shell_x)
 
-    def handle_mouse_motion(self, pos):
-        if self.dragging_part:
-            self.dragging_part.rect.center = pos
+    def draw(self, alpha=1.0):
+        # Returns the screen regions that changed this frame
+        self.interpolate_shell(alpha)
+        if self.full_redraw or not DIRTY_RECTS:
+            self.sprites.repaint_rect(self.screen.get_rect())
+            self.full_redraw = False
+        return self.sprites.draw(self.screen)
 
-    def draw_parts(self):
-        total_width = sum(part.rect.width for part in self.parts) + 10 * (len(self.parts) - 1)
-        start_x = (WIDTH - total_width) // 2
-        for i, part in enumerate(self.parts):
-            if part != self.dragging_part:
-                part.rect.bottomleft = (start_x + i * (part.rect.width + 10), HEIGHT - 20)
-                self.screen.blit(part.image, part.rect)
+    def compose(self, alpha=1.0):
+        # The texture renderer's draw(): the whole frame is composed from textures, which is
+        # cheap on the GPU, so there are no dirty rects. Returns [] when nothing changed.
+        self.interpolate_shell(alpha)
+        sprites = self.sprites.sprites()
+        if not (self.full_redraw or self.profiler.overlay or any(sprite.dirty for sprite in sprites)):
+            return []
+        self.full_redraw = False
+        self.renderer.blit(BACKGROUND, (0, 0))
+        self.renderer.draw_sprites(sprites)
+        for sprite in sprites:
+            if sprite.dirty == 1:
+                sprite.dirty = 0
+        overlay = self.profiler.overlay_image()
+        if overlay:
+            self.renderer.blit(overlay, (5, 5))
+        return [pygame.Rect(0, 0, WIDTH, HEIGHT)]
 
     def check_all_parts_assembled(self):
         return len(self.assembled_parts) == len(self.pc_slots)
 
     def move_to_next_shell(self):
         print("Good job! All pieces are correctly placed.")
-        self.current_shell += 1
-        if self.current_shell < self.total_shells:
-            print(f"Moving to shell {self.current_shell + 1}")
-            self.pc_shell_rect = PC_SHELL[self.current_shell].get_rect(center=(WIDTH // 2, HEIGHT // 2))
-            self.assembled_parts.clear()
-            self.parts = [Part(name, image) for name, image in PARTS.items()]
+        if self.current_shell + 1 < self.total_shells:
+            # The finished shell slides out, then update() swaps in the next one
+            self.game_state = "SLIDING_OUT"
         else:
             print("Congratulations! You've completed all shells!")
             # You can add game completion logic here
 
+    def show_next_shell(self):
+        self.current_shell += 1
+        print(f"Moving to shell {self.current_shell + 1}")
+        # Already decoded by the prefetch started when the previous shell came in
+        self.shell_image = self.shells.get(self.current_shell)
+        if self.current_shell + 1 < self.total_shells:
+            self.shells.prefetch(self.current_shell + 1)
+        self.pc_shell_rect = self.shell_image.get_rect()
+        self.pc_shell_rect.right = -100
+        self.prev_shell_x = self.pc_shell_rect.x
+        self.sprites.remove(*self.assembled_parts.values())
+        self.assembled_parts.clear()
+        # Every part went onto the last shell, so the tray is empty until it's restocked
+        for part in self.create_parts():
+            self.tray.add(part)
+        self.place_shell()
+
 # Main function
 if __name__ == "__main__":
-    game = Game()
-    game.run()
+    if '--bake' in sys.argv:
+        pygame.display.set_mode((WIDTH, HEIGHT))
+        bake_assets()
+    else:
+        renderer = RENDERER
+        for arg in sys.argv[1:]:
+            if arg.startswith('--renderer='):
+                renderer = arg.split('=', 1)[1]
+                if renderer not in RENDERER_MODES:
+                    sys.exit(f"--renderer must be one of {', '.join(RENDERER_MODES)}")
+        game = Game(renderer)
+        game.run()
     pygame.quit()
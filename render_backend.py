@@ -0,0 +1,74 @@
+import weakref
+
+import pygame
+
+try:
+    from pygame._sdl2.video import Renderer, Texture, Window
+    from pygame._sdl2.sdl2 import error as SDLError
+except ImportError:  # pygame 1.x, or a build without _sdl2
+    Renderer = None
+    SDLError = pygame.error
+
+# Renderer modes: 'gpu' uses a GPU renderer, 'software' the SDL software renderer, which works
+# without a GPU, and 'surface' plain surfaces. A renderer that can't be created falls back to surfaces.
+RENDERER_MODES = ('gpu', 'software', 'surface')
+
+
+class TextureRenderer:
+    # Draws frames from textures with pygame._sdl2's Renderer. A surface is uploaded the first
+    # time it's drawn and the texture is reused until the surface is garbage collected, so a
+    # surface must not be drawn on after its first blit here; draw a new surface instead.
+    def __init__(self, title, size, software=False, vsync=False):
+        # convert() and convert_alpha() still need a display mode, so the display module gets
+        # a hidden 1x1 one and the game is drawn into its own window
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+        self.window = Window(title, size)
+        try:
+            self.renderer = Renderer(self.window, accelerated=0 if software else 1, vsync=vsync)
+        except (SDLError, pygame.error):
+            self.window.destroy()
+            raise
+        self.software = software
+        self.textures = weakref.WeakKeyDictionary()
+        self.uploads = 0
+
+    def texture(self, surface):
+        texture = self.textures.get(surface)
+        if texture is None:
+            texture = self.textures[surface] = Texture.from_surface(self.renderer, surface)
+            self.uploads += 1
+        return texture
+
+    def blit(self, surface, dest, area=None):
+        # Same arguments as Surface.blit; area is the part of surface to draw
+        size = area.size if area else surface.get_size()
+        self.texture(surface).draw(srcrect=area, dstrect=pygame.Rect(dest[0], dest[1], *size))
+
+    def draw_sprites(self, sprites):
+        # Visible sprites in order, honouring DirtySprite.source_rect
+        for sprite in sprites:
+            if sprite.visible:
+                self.blit(sprite.image, sprite.rect, sprite.source_rect)
+
+    def present(self):
+        self.renderer.present()
+
+    def to_surface(self):
+        # Reads the last frame back, for screenshots and tests
+        return self.renderer.to_surface()
+
+    def close(self):
+        self.textures.clear()
+        self.window.destroy()
+
+
+def create_renderer(mode, title, size):
+    # A TextureRenderer for mode, or None when the game should draw on surfaces instead
+    if mode == 'surface' or Renderer is None:
+        return None
+    software = mode == 'software'
+    try:
+        return TextureRenderer(title, size, software)
+    except (SDLError, pygame.error) as e:
+        print(f"Couldn't create a {'software' if software else 'GPU'} renderer ({e}), drawing on surfaces")
+        return None
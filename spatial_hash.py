@@ -0,0 +1,61 @@
+
+class SpatialHash:
+    # Broad phase: every item sits in the buckets of the grid cells its rect overlaps, so
+    # a query only looks at items near the query rect. Rects can be anything with
+    # left/top/right/bottom (pygame Rects, pgzero Actors).
+    def __init__(self, cell_size=50):
+        self.cell_size = cell_size
+        self.buckets = {}  # (col, row) -> {item: None}, a dict so iteration order is stable
+        self.cells = {}  # item -> the cells it was last filed under
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, item):
+        return item in self.cells
+
+    def cells_for(self, rect):
+        size = self.cell_size
+        left, top = int(rect.left) // size, int(rect.top) // size
+        right, bottom = (int(rect.right) - 1) // size, (int(rect.bottom) - 1) // size
+        return tuple((col, row) for row in range(top, bottom + 1) for col in range(left, right + 1))
+
+    def insert(self, item, rect):
+        self.move(item, rect)
+
+    def move(self, item, rect):
+        # Only touches the buckets if the item actually changed cells
+        cells = self.cells_for(rect)
+        old = self.cells.get(item)
+        if old == cells:
+            return
+        if old:
+            self.unfile(item, old)
+        for cell in cells:
+            self.buckets.setdefault(cell, {})[item] = None
+        self.cells[item] = cells
+
+    def remove(self, item):
+        old = self.cells.pop(item, None)
+        if old:
+            self.unfile(item, old)
+
+    def unfile(self, item, cells):
+        for cell in cells:
+            bucket = self.buckets[cell]
+            del bucket[item]
+            if not bucket:
+                del self.buckets[cell]
+
+    def query(self, rect):
+        # Items in any cell rect overlaps; they may still not touch rect itself
+        found = {}
+        for cell in self.cells_for(rect):
+            bucket = self.buckets.get(cell)
+            if bucket:
+                found.update(bucket)
+        return list(found)
+
+    def clear(self):
+        self.buckets.clear()
+        self.cells.clear()
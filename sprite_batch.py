@@ -0,0 +1,120 @@
+import pygame
+
+
+class SpriteAtlas:
+    # Packs many small images into one surface. Sprites then use the atlas surface as their
+    # image and the packed region as their source_rect.
+    def __init__(self, images, max_width=1024, padding=1):
+        self.rects = {}
+
+        # Shelf packing: tallest images first, left to right, wrapping onto a new shelf
+        x = y = shelf_height = width = 0
+        for name, image in sorted(images.items(), key=lambda item: -item[1].get_height()):
+            w, h = image.get_size()
+            if x and x + w > max_width:
+                x, y = 0, y + shelf_height + padding
+                shelf_height = 0
+            self.rects[name] = pygame.Rect(x, y, w, h)
+            x += w + padding
+            shelf_height = max(shelf_height, h)
+            width = max(width, x)
+
+        self.surface = pygame.Surface((max(width, 1), max(y + shelf_height, 1)), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert_alpha()
+        self.surface.fill((0, 0, 0, 0))
+        for name, image in images.items():
+            # BLEND_RGBA_MAX onto a transparent surface copies the pixels, alpha included
+            self.surface.blit(image, self.rects[name], special_flags=pygame.BLEND_RGBA_MAX)
+
+    def __getitem__(self, name):
+        return self.rects[name]
+
+
+class ScaledSpriteCache:
+    # Scaled images keyed by (name, scale), plus one atlas per scale built from them
+    def __init__(self, loader):
+        self.loader = loader  # (name, scale) -> Surface
+        self.images = {}
+        self.atlases = {}
+
+    def get(self, name, scale):
+        key = (name, scale)
+        if key not in self.images:
+            self.images[key] = self.loader(name, scale)
+        return self.images[key]
+
+    def atlas(self, names, scale, extra_images=None):
+        key = (tuple(names), scale)
+        if key not in self.atlases:
+            images = {name: self.get(name, scale) for name in names}
+            images.update(extra_images or {})
+            self.atlases[key] = SpriteAtlas(images)
+        return self.atlases[key]
+
+
+def add_dirty_rect(dirty, rect):
+    # Merge rect with every dirty rect it overlaps so no area is drawn twice
+    rect = pygame.Rect(rect)
+    if not rect.width or not rect.height:
+        return
+    i = rect.collidelist(dirty)
+    while i > -1:
+        rect.union_ip(dirty.pop(i))
+        i = rect.collidelist(dirty)
+    dirty.append(rect)
+
+
+class BatchedLayeredDirty(pygame.sprite.LayeredDirty):
+    # LayeredDirty that collects the whole frame (background repairs and every sprite, in layer
+    # order) into a single Surface.blits() call instead of one blit call per sprite.
+    full_redraw_ratio = 0.6  # Above this fraction of the screen it's cheaper to redraw everything
+
+    def draw(self, surface, bgsurf=None, special_flags=None):
+        if bgsurf is not None:
+            self._bgd = bgsurf
+        screen_rect = surface.get_clip()
+        old_rects = self.spritedict
+        sprites = self.sprites()
+
+        # 1. Find the dirty area: removed sprites, plus old and new rects of every dirty sprite
+        dirty = []
+        for rect in self.lostsprites:
+            add_dirty_rect(dirty, screen_rect.clip(rect))
+        self.lostsprites = []
+        for sprite in sprites:
+            if sprite.dirty:
+                add_dirty_rect(dirty, screen_rect.clip(sprite_rect(sprite)))
+                if old_rects[sprite] is not self._init_rect:
+                    add_dirty_rect(dirty, screen_rect.clip(old_rects[sprite]))
+
+        full = sum(rect.width * rect.height for rect in dirty) > self.full_redraw_ratio * screen_rect.width * screen_rect.height
+        if full:
+            dirty = [screen_rect]
+
+        # 2. Repaint the background under the dirty area, then every sprite that touches it
+        batch = []
+        if self._bgd is not None:
+            batch.extend((self._bgd, rect, rect) for rect in dirty)
+        for sprite in sprites:
+            if sprite.visible:
+                rect = sprite_rect(sprite)
+                source = sprite.source_rect or sprite.image.get_rect()
+                if sprite.dirty or full:
+                    batch.append((sprite.image, rect, source))
+                    old_rects[sprite] = screen_rect.clip(rect)
+                else:
+                    for i in rect.collidelistall(dirty):
+                        clip = rect.clip(dirty[i])
+                        batch.append((sprite.image, clip, clip.move(source.x - rect.x, source.y - rect.y)))
+            if sprite.dirty == 1:
+                sprite.dirty = 0
+        if batch:
+            surface.blits(batch, doreturn=False)
+        return dirty
+
+
+def sprite_rect(sprite):
+    if sprite.source_rect is not None:
+        return pygame.Rect(sprite.rect.topleft, sprite.source_rect.size)
+    return pygame.Rect(sprite.rect)
@@ -0,0 +1,72 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+class SurfaceCache:
+    # LRU cache of decoded surfaces with a byte budget. Surfaces can be prefetched on a
+    # worker thread; they only become visible to get() once the main thread publishes them.
+    def __init__(self, loader, budget_bytes):
+        self.loader = loader  # key -> Surface, called on the worker thread for prefetches
+        self.budget_bytes = budget_bytes
+        self.surfaces = OrderedDict()
+        self.pending = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='surface-prefetch')
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def prefetch(self, key):
+        if key not in self.surfaces and key not in self.pending:
+            self.pending[key] = self.executor.submit(self.loader, key)
+
+    def poll(self):
+        # Call once per frame on the main thread to publish finished prefetches
+        for key, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[key]
+                self.publish(key, future.result())
+
+    def get(self, key):
+        if key in self.surfaces:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return self.surfaces[key]
+
+        future = self.pending.pop(key, None)
+        if future is not None and future.done():
+            self.hits += 1
+        else:
+            self.misses += 1
+        # Blocks if the prefetch is still running, or loads synchronously if there was none
+        surface = future.result() if future is not None else self.loader(key)
+        self.publish(key, surface)
+        return surface
+
+    def publish(self, key, surface):
+        if key in self.surfaces:
+            self.resident_bytes -= surface_bytes(self.surfaces.pop(key))
+        self.surfaces[key] = surface
+        self.resident_bytes += surface_bytes(surface)
+
+        # Evict least recently used surfaces, but always keep the one just published
+        while self.resident_bytes > self.budget_bytes and len(self.surfaces) > 1:
+            _, evicted = self.surfaces.popitem(last=False)
+            self.resident_bytes -= surface_bytes(evicted)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'resident_bytes': self.resident_bytes,
+            'resident_surfaces': len(self.surfaces),
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
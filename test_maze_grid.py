@@ -0,0 +1,72 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from maze_grid import MazeGrid
+from maze_rules import MAZE
+
+# A ring of corridor around one wall block, inside a wall border
+RING = [
+    [0, 0, 0, 0, 0],
+    [0, 1, 1, 1, 0],
+    [0, 1, 0, 1, 0],
+    [0, 1, 1, 1, 0],
+    [0, 0, 0, 0, 0],
+]
+BOX = 20
+
+
+def overlaps_wall(grid, left, top, width=BOX, height=BOX):
+    size = grid.cell_size
+    cols = range(math.floor(left / size), math.ceil((left + width) / size))
+    rows = range(math.floor(top / size), math.ceil((top + height) / size))
+    return any(not grid.is_open((col, row)) for row in rows for col in cols)
+
+
+def test_stops_flush_against_walls():
+    grid = MazeGrid(RING)
+    assert grid.sweep((65, 65, BOX, BOX), 200, 0) == (180, 65)
+    assert grid.sweep((65, 65, BOX, BOX), -100, 0) == (50, 65)
+    assert grid.sweep((65, 65, BOX, BOX), 0, -100) == (65, 50)
+
+
+def test_does_not_tunnel_through_walls():
+    # Far more than a cell in one step, straight at the middle block
+    grid = MazeGrid(RING)
+    assert grid.sweep((115, 65, BOX, BOX), 0, 500) == (115, 80)
+    assert grid.sweep((65, 115, BOX, BOX), 500, 0) == (80, 115)
+
+
+def test_slides_along_walls_and_round_corners():
+    grid = MazeGrid(RING)
+    # Pressed diagonally into a wall, the box keeps the move along it
+    assert grid.sweep((65, 65, BOX, BOX), -30, 10) == (50, 75)
+    # Flush against a wall isn't inside it, so moving along it isn't blocked
+    assert grid.sweep((50, 65, BOX, BOX), 0, 60) == (50, 125)
+    # Moving diagonally round the corridor: x first, then y in the new column
+    assert grid.sweep((65, 65, BOX, BOX), 100, 100) == (165, 165)
+
+
+def test_batch_matches_single_sweeps():
+    grid = MazeGrid(MAZE)
+    rng = random.Random(0)
+    size = grid.cell_size
+    boxes, moves = [], []
+    while len(boxes) < 5000:
+        col, row = rng.randrange(grid.cols), rng.randrange(grid.rows)
+        left = col * size + rng.uniform(0, size - BOX)
+        top = row * size + rng.uniform(0, size - BOX)
+        if overlaps_wall(grid, left, top):
+            continue
+        boxes.append((left, top))
+        # Batches only take moves shorter than a cell; some are exact or flush
+        moves.append(rng.choice([(rng.uniform(-size + 1, size - 1), rng.uniform(-size + 1, size - 1)),
+                                 (rng.choice([-5, 0, 5]), rng.choice([-5, 0, 5]))]))
+    boxes, moves = np.array(boxes), np.array(moves)
+    left, top = grid.sweep_batch(boxes[:, 0], boxes[:, 1], BOX, BOX, moves[:, 0], moves[:, 1])
+    for i in range(len(boxes)):
+        expected = grid.sweep((boxes[i, 0], boxes[i, 1], BOX, BOX), moves[i, 0], moves[i, 1])
+        assert (left[i], top[i]) == pytest.approx(expected)
+        assert not overlaps_wall(grid, left[i], top[i])
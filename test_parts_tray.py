@@ -0,0 +1,74 @@
+import pygame
+
+from parts_tray import PartTray
+
+
+class Part(pygame.sprite.DirtySprite):
+    def __init__(self, width=100, height=50):
+        super().__init__()
+        self.image = pygame.Surface((width, height))
+        self.rect = self.image.get_rect()
+
+
+def make_tray(count=40):
+    group = pygame.sprite.LayeredDirty()
+    tray = PartTray(pygame.Rect(0, 0, 800, 600), group, layer=1)
+    parts = [Part() for _ in range(count)]
+    tray.set_parts(parts)
+    tray.layout()
+    return tray, group, parts
+
+
+def test_only_visible_parts_are_in_the_group():
+    tray, group, parts = make_tray()
+    shown = [part for part in parts if part in group]
+    assert shown == parts[:len(shown)]
+    assert 0 < len(shown) < len(parts)
+    assert all(part.rect.right > 0 and part.rect.left < 800 for part in shown)
+
+
+def test_part_at_finds_the_part_under_the_mouse():
+    tray, group, parts = make_tray()
+    assert tray.part_at(parts[1].rect.center) is parts[1]
+    assert tray.part_at((400, 10)) is None
+
+
+def test_released_part_scrolled_out_of_view_leaves_the_group():
+    # Dropping a held part without a snap after its slot scrolled away mustn't leave it drawn
+    # where it was dropped, where it can't be clicked
+    tray, group, parts = make_tray()
+    part = parts[0]
+    tray.hold(part)
+    part.rect.center = (350, 180)
+    tray.scroll_by(3000)
+    tray.release()
+    tray.layout()
+    assert part not in group
+    assert part not in tray.index
+    assert tray.part_at((350, 180)) is None
+
+    tray.scroll_by(-3000)
+    assert part in group
+    assert tray.part_at(part.rect.center) is part
+
+
+def test_released_part_in_view_goes_back_to_its_place():
+    tray, group, parts = make_tray()
+    part = parts[2]
+    home = part.rect.topleft
+    tray.hold(part)
+    part.rect.center = (350, 180)
+    tray.release()
+    tray.layout()
+    assert part in group
+    assert part.rect.topleft == home
+    assert tray.part_at(part.rect.center) is part
+
+
+def test_added_parts_join_the_row():
+    tray, group, parts = make_tray(count=0)
+    for part in [Part(), Part()]:
+        tray.add(part)
+    tray.layout()
+    assert len(group) == 2
+    assert tray.part_at(tray.parts[1].rect.center) is tray.parts[1]
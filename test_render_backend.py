@@ -0,0 +1,66 @@
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import random
+
+import numpy as np
+import pygame
+import pytest
+
+from render_backend import Renderer
+
+pytestmark = pytest.mark.skipif(Renderer is None, reason='needs pygame._sdl2')
+
+
+def playing_game(mode):
+    # A Computer Builder game a few frames into sliding in its first shell
+    import pythonmain
+    random.seed(0)
+    game = pythonmain.Game(mode)
+    game.start_game()
+    for _ in range(10):
+        game.update(1 / 60)
+    return game
+
+
+@pytest.fixture(autouse=True)
+def game_dir(monkeypatch):
+    # The game loads its images relative to the working directory
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    pygame.init()
+    yield
+    pygame.quit()
+
+
+def test_software_renderer_matches_surfaces():
+    game = playing_game('surface')
+    game.full_redraw = True
+    game.draw()
+    expected = pygame.surfarray.array3d(game.screen).astype(int)
+
+    game = playing_game('software')
+    if game.renderer is None:
+        pytest.skip('no software renderer here')
+    game.full_redraw = True
+    game.compose()
+    frame = pygame.surfarray.array3d(game.renderer.to_surface()).astype(int)
+    game.renderer.close()
+    # Alpha blending rounds differently in SDL's renderer
+    assert np.abs(frame - expected).max() <= 3
+
+
+def test_surfaces_are_uploaded_once():
+    game = playing_game('software')
+    if game.renderer is None:
+        pytest.skip('no software renderer here')
+    game.full_redraw = True
+    game.compose()
+    uploads = game.renderer.uploads
+    game.update(1 / 60)
+    game.full_redraw = True
+    game.compose()
+    game.renderer.close()
+    assert uploads > 0
+    assert game.renderer.uploads == uploads
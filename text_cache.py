@@ -0,0 +1,63 @@
+from collections import OrderedDict
+
+import pygame
+
+
+class FontRegistry:
+    # Loads each font face/size once; pygame.font.Font(...) is slow to construct
+    def __init__(self):
+        self.fonts = {}
+
+    def get(self, size, name=None):
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = self.fonts[key] = pygame.font.Font(name, size)
+        return font
+
+
+class TextCache:
+    # LRU cache of rendered text surfaces. The surfaces are shared, so blit them but don't draw on them.
+    def __init__(self, fonts, max_entries=256):
+        self.fonts = fonts
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, size, color, antialias=True, font_name=None):
+        key = (text, size, tuple(color), antialias, font_name)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.fonts.get(size, font_name).render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate(),
+            'entries': len(self.surfaces),
+            'fonts': len(self.fonts.fonts),
+        }
+
+
+# Shared by everything that draws text
+fonts = FontRegistry()
+text_cache = TextCache(fonts)
+
+
+def render_text(text, size, color, antialias=True, font_name=None):
+    return text_cache.render(text, size, color, antialias, font_name)
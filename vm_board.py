@@ -0,0 +1,103 @@
+from collections import deque
+
+
+class ResourceTypes:
+    # Interns resource type names as bit flags, so a set of types is just an int mask
+    def __init__(self):
+        self.bits = {}
+        self.names = []
+
+    def bit(self, name):
+        bit = self.bits.get(name)
+        if bit is None:
+            bit = self.bits[name] = 1 << len(self.names)
+            self.names.append(name)
+        return bit
+
+    def mask(self, names):
+        mask = 0
+        for name in names:
+            mask |= self.bit(name)
+        return mask
+
+
+def bits_of(mask):
+    # The set bits of mask, lowest first; costs one loop per set bit, not per possible type
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
+
+
+class VMBoard:
+    # Every VM keeps a requirement mask and a filled mask, and the board counts the VMs that
+    # are still missing something. The count only changes when a VM is filled or reset, so
+    # checking whether the puzzle is solved is O(1). VMs are whatever hashable keys the caller uses.
+    def __init__(self, types):
+        self.types = types
+        self.required = {}
+        self.filled = {}
+        self.unsolved = 0
+
+    def add(self, vm, requirement):
+        # requirement is a list of type names
+        self.required[vm] = self.types.mask(requirement)
+        self.filled[vm] = 0
+        if self.required[vm]:
+            self.unsolved += 1
+
+    def missing(self, vm):
+        return self.required[vm] & ~self.filled[vm]
+
+    def placed(self, vm):
+        # How many resources are on vm
+        return bin(self.filled[vm]).count('1')
+
+    def fill(self, vm, bit):
+        if not self.missing(vm) & bit:
+            return False
+        self.filled[vm] |= bit
+        if not self.missing(vm):
+            self.unsolved -= 1
+        return True
+
+    def reset(self):
+        self.filled = dict.fromkeys(self.required, 0)
+        self.unsolved = sum(1 for required in self.required.values() if required)
+
+    @property
+    def solved(self):
+        return self.unsolved == 0
+
+
+class Inventory:
+    # What the player is carrying, queued per type bit in pickup order
+    def __init__(self):
+        self.by_type = {}
+        self.items = set()
+        self.mask = 0
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def add(self, bit, item):
+        self.by_type.setdefault(bit, deque()).append(item)
+        self.items.add(item)
+        self.mask |= bit
+
+    def take(self, wanted):
+        # Takes the oldest carried item of every type in the wanted mask that's being carried
+        taken = []
+        for bit in bits_of(wanted & self.mask):
+            queue = self.by_type[bit]
+            taken.append(queue.popleft())
+            self.items.discard(taken[-1])
+            if not queue:
+                del self.by_type[bit]
+                self.mask &= ~bit
+        return taken
+
+    def clear(self):
+        self.by_type.clear()
+        self.items.clear()
+        self.mask = 0